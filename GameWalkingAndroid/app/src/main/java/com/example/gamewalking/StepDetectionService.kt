@@ -24,6 +24,13 @@ class StepDetectionService : Service(), SensorEventListener {
     companion object {
         private const val NOTIFICATION_ID = 1
         private const val CHANNEL_ID = "GameWalkingChannel"
+
+        // Raw accelerometer streaming, steps are detected on the PC. The
+        // requested rate is only a hint to Android, so batches carry the rate
+        // measured from the sample timestamps, smoothed over batches
+        private const val ACCEL_SAMPLE_RATE = 200
+        private const val ACCEL_BATCH_SIZE = 20
+        private const val ACCEL_RATE_SMOOTHING = 0.2
     }
     
     private lateinit var sensorManager: SensorManager
@@ -109,13 +116,13 @@ class StepDetectionService : Service(), SensorEventListener {
         }
         
         if (stepDetectorSensor == null && stepCounterSensor == null) {
-            // Fallback to accelerometer if step sensors are not available
+            // Fallback to streaming the accelerometer if step sensors are not available
             val accelerometer = sensorManager.getDefaultSensor(Sensor.TYPE_ACCELEROMETER)
             if (accelerometer != null) {
                 sensorManager.registerListener(
                     this,
                     accelerometer,
-                    SensorManager.SENSOR_DELAY_FASTEST
+                    1_000_000 / ACCEL_SAMPLE_RATE
                 )
             }
         }
@@ -135,8 +142,8 @@ class StepDetectionService : Service(), SensorEventListener {
                 }
                 
                 Sensor.TYPE_ACCELEROMETER -> {
-                    // Fallback accelerometer-based step detection
-                    handleAccelerometerData(sensorEvent.values)
+                    // Fallback: stream raw samples for step detection on the PC
+                    handleAccelerometerData(sensorEvent.timestamp, sensorEvent.values)
                 }
             }
         }
@@ -154,37 +161,58 @@ class StepDetectionService : Service(), SensorEventListener {
         }
         
         if (currentStepCount > lastStepCount) {
-            onStepDetected()
+            // One packet carrying every step since the last counter update
+            onStepDetected(currentStepCount - lastStepCount)
             lastStepCount = currentStepCount
         }
     }
     
-    // Simple accelerometer-based step detection (fallback)
-    private var lastAcceleration = 0f
-    private var currentAcceleration = 0f
-    private var lastTime = 0L
-    private val stepThreshold = 12f
+    // Accelerometer samples are batched and sent as ACCEL packets (fallback)
+    private var accelSamples = ShortArray(ACCEL_BATCH_SIZE * 3)
+    private var accelCount = 0
+    private var accelFirstTimestamp = 0L
+    private var accelLastTimestamp = 0L
+    private var accelMeasuredRate = 0.0
     
-    private fun handleAccelerometerData(values: FloatArray) {
-        val x = values[0]
-        val y = values[1]
-        val z = values[2]
-        
-        lastAcceleration = currentAcceleration
-        currentAcceleration = kotlin.math.sqrt((x * x + y * y + z * z).toDouble()).toFloat()
-        
-        val delta = currentAcceleration - lastAcceleration
-        val currentTime = System.currentTimeMillis()
+    private fun handleAccelerometerData(timestamp: Long, values: FloatArray) {
+        if (accelCount == 0) {
+            accelFirstTimestamp = timestamp
+        }
+        accelLastTimestamp = timestamp
         
-        if (kotlin.math.abs(delta) > stepThreshold && currentTime - lastTime > 500) {
-            onStepDetected()
-            lastTime = currentTime
+        val offset = accelCount * 3
+        for (axis in 0 until 3) {
+            accelSamples[offset + axis] = (values[axis] * UDPSender.ACCEL_SCALE)
+                .coerceIn(Short.MIN_VALUE.toFloat(), Short.MAX_VALUE.toFloat()).toInt().toShort()
+        }
+        accelCount++
+        
+        if (accelCount == ACCEL_BATCH_SIZE) {
+            val batch = accelSamples
+            val firstTimestamp = accelFirstTimestamp
+            val sampleRate = measureAccelRate(accelLastTimestamp - firstTimestamp)
+            accelSamples = ShortArray(ACCEL_BATCH_SIZE * 3)
+            accelCount = 0
+            serviceScope.launch {
+                udpSender.sendAccelerometer(firstTimestamp, sampleRate, batch, ACCEL_BATCH_SIZE)
+            }
+        }
+    }
+    
+    // Sample rate from a full batch spanning spanNanos between its first and last sample
+    private fun measureAccelRate(spanNanos: Long): Int {
+        if (spanNanos > 0) {
+            val rate = (ACCEL_BATCH_SIZE - 1) * 1_000_000_000.0 / spanNanos
+            accelMeasuredRate = if (accelMeasuredRate == 0.0) rate
+                else accelMeasuredRate + ACCEL_RATE_SMOOTHING * (rate - accelMeasuredRate)
         }
+        if (accelMeasuredRate == 0.0) return ACCEL_SAMPLE_RATE
+        return Math.round(accelMeasuredRate).toInt().coerceIn(1, 0xFFFF)
     }
     
-    private fun onStepDetected() {
+    private fun onStepDetected(stepCount: Int = 1) {
         serviceScope.launch {
-            udpSender.sendStep()
+            udpSender.sendStep(stepCount)
         }
     }
     
@@ -1,36 +1,73 @@
 package com.example.gamewalking
 
+import android.os.SystemClock
 import kotlinx.coroutines.Dispatchers
 import kotlinx.coroutines.withContext
 import java.net.DatagramPacket
 import java.net.DatagramSocket
 import java.net.InetAddress
 import java.net.SocketException
+import java.nio.ByteBuffer
+import kotlin.random.Random
+
+class UDPSender(
+    private val ipAddress: String,
+    private val port: Int,
+    private val deviceId: Int = Random.nextInt(0x10000)
+) {
+
+    companion object {
+        // Protocol v2 header, see GameWalkingWindows/protocol.py
+        private const val MAGIC_V2: Byte = 0xB2.toByte()
+        private const val MSG_STEP: Byte = 1
+        private const val MSG_ACCEL: Byte = 2
+        private const val HEADER_SIZE = 18
+
+        // Each STEP packet repeats the previous REDUNDANCY steps (8 bytes each)
+        // so a single lost datagram does not lose a step
+        private const val REDUNDANCY = 3
+        private const val STEP_BUFFER_SIZE = HEADER_SIZE + 1 + REDUNDANCY * 8
+
+        // ACCEL body: uint16 sample rate + x/y/z int16 samples in 0.01 m/s^2
+        const val ACCEL_SCALE = 100f
+        const val MAX_ACCEL_SAMPLES = 64
+        private const val ACCEL_BUFFER_SIZE = HEADER_SIZE + 2 + MAX_ACCEL_SAMPLES * 6
+    }
 
-class UDPSender(private val ipAddress: String, private val port: Int) {
-    
     private var socket: DatagramSocket? = null
     private var targetAddress: InetAddress? = null
-    
+
+    // Reused for every packet to avoid per-step allocations
+    private val buffer = ByteArray(STEP_BUFFER_SIZE)
+    private val header = ByteBuffer.wrap(buffer)
+    private var packet: DatagramPacket? = null
+    private val accelBuffer = ByteArray(ACCEL_BUFFER_SIZE)
+    private val accelBody = ByteBuffer.wrap(accelBuffer)
+    private var accelPacket: DatagramPacket? = null
+    private var sequence = 0
+
+    // Ring of recently sent steps: sequence, timestamp (us) and step count
+    private val historySequence = IntArray(REDUNDANCY)
+    private val historyTime = LongArray(REDUNDANCY)
+    private val historyCount = IntArray(REDUNDANCY)
+    private var historySize = 0
+    private var historyNext = 0
+
     init {
         try {
             socket = DatagramSocket()
             targetAddress = InetAddress.getByName(ipAddress)
+            packet = DatagramPacket(buffer, buffer.size, targetAddress, port)
+            accelPacket = DatagramPacket(accelBuffer, accelBuffer.size, targetAddress, port)
         } catch (e: Exception) {
             e.printStackTrace()
         }
     }
-    
-    suspend fun sendStep() {
+
+    suspend fun sendStep(stepCount: Int = 1) {
         withContext(Dispatchers.IO) {
             try {
-                val message = "STEP"
-                val buffer = message.toByteArray()
-                
-                targetAddress?.let { address ->
-                    val packet = DatagramPacket(buffer, buffer.size, address, port)
-                    socket?.send(packet)
-                }
+                sendStepPacket(stepCount)
             } catch (e: SocketException) {
                 // Handle socket exceptions (connection issues)
                 e.printStackTrace()
@@ -40,7 +77,74 @@ class UDPSender(private val ipAddress: String, private val port: Int) {
             }
         }
     }
-    
+
+    /**
+     * Stream raw accelerometer samples for step detection on the PC.
+     * samples holds sampleCount x/y/z triples already scaled by ACCEL_SCALE,
+     * firstSampleNanos is the elapsedRealtimeNanos timestamp of the first one.
+     */
+    suspend fun sendAccelerometer(firstSampleNanos: Long, sampleRate: Int, samples: ShortArray, sampleCount: Int) {
+        withContext(Dispatchers.IO) {
+            try {
+                sendAccelPacket(firstSampleNanos, sampleRate, samples, sampleCount.coerceAtMost(MAX_ACCEL_SAMPLES))
+            } catch (e: Exception) {
+                e.printStackTrace()
+            }
+        }
+    }
+
+    @Synchronized
+    private fun sendStepPacket(stepCount: Int) {
+        val outgoing = packet ?: return
+        val now = SystemClock.elapsedRealtimeNanos() / 1000
+        val stepSequence = sequence
+
+        header.clear()
+        putHeader(header, MSG_STEP, now, stepCount)
+
+        // Repeat the previous steps, newest first
+        header.put(historySize.toByte())
+        for (i in 1..historySize) {
+            val slot = (historyNext - i + REDUNDANCY) % REDUNDANCY
+            header.putShort((stepSequence - historySequence[slot]).toShort())
+            header.putShort(historyCount[slot].coerceIn(0, 0xFFFF).toShort())
+            header.putInt((now - historyTime[slot]).coerceIn(0L, 0xFFFFFFFFL).toInt())
+        }
+        outgoing.length = header.position()
+
+        socket?.send(outgoing)
+
+        historySequence[historyNext] = stepSequence
+        historyTime[historyNext] = now
+        historyCount[historyNext] = stepCount
+        historyNext = (historyNext + 1) % REDUNDANCY
+        if (historySize < REDUNDANCY) historySize++
+    }
+
+    @Synchronized
+    private fun sendAccelPacket(firstSampleNanos: Long, sampleRate: Int, samples: ShortArray, sampleCount: Int) {
+        val outgoing = accelPacket ?: return
+
+        accelBody.clear()
+        putHeader(accelBody, MSG_ACCEL, firstSampleNanos / 1000, sampleCount)
+        accelBody.putShort(sampleRate.toShort())
+        for (i in 0 until sampleCount * 3) {
+            accelBody.putShort(samples[i])
+        }
+
+        outgoing.length = accelBody.position()
+        socket?.send(outgoing)
+    }
+
+    private fun putHeader(target: ByteBuffer, msgType: Byte, senderTimeMicros: Long, stepCount: Int) {
+        target.put(MAGIC_V2)
+        target.put(msgType)
+        target.putShort(deviceId.toShort())
+        target.putInt(sequence++)
+        target.putLong(senderTimeMicros)
+        target.putShort(stepCount.coerceIn(0, 0xFFFF).toShort())
+    }
+
     fun close() {
         try {
             socket?.close()
@@ -48,4 +152,4 @@ class UDPSender(private val ipAddress: String, private val port: Int) {
             e.printStackTrace()
         }
     }
-}
\ No newline at end of file
+}
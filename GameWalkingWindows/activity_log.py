@@ -0,0 +1,96 @@
+import collections
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+class LogEntry:
+    __slots__ = ('timestamp', 'level', 'source', 'message')
+
+    def __init__(self, timestamp, level, source, message):
+        self.timestamp = timestamp
+        self.level = level
+        self.source = source
+        self.message = message
+
+    def format(self):
+        clock = time.strftime("%H:%M:%S", time.localtime(self.timestamp))
+        if self.level == INFO:
+            return f"[{clock}] {self.message}"
+        return f"[{clock}] {LEVEL_NAMES.get(self.level, self.level)} {self.source}: {self.message}"
+
+
+class ActivityLog:
+    """Fixed-capacity activity log that any thread can write to
+
+    log() only appends to two bounded deques (both thread-safe for append
+    and popleft), so it is cheap enough for per-step messages. The GUI
+    drains new entries with take_pending() on a timer and renders them in
+    one batch; the ring keeps the last `capacity` entries for re-rendering
+    when the level/source filter changes.
+    """
+
+    def __init__(self, capacity=1000, min_level=INFO, source=None):
+        self.capacity = capacity
+        self.entries = collections.deque(maxlen=capacity)
+        self.pending = collections.deque(maxlen=capacity)
+        self.min_level = min_level
+        self.source = source  # None shows every source
+        self.sources = set()
+
+    def log(self, level, source, message):
+        """Record a message from any thread"""
+        entry = LogEntry(time.time(), level, source, message)
+        self.entries.append(entry)
+        self.pending.append(entry)
+        if source not in self.sources:
+            self.sources.add(source)
+
+    def debug(self, source, message):
+        self.log(DEBUG, source, message)
+
+    def info(self, source, message):
+        self.log(INFO, source, message)
+
+    def warning(self, source, message):
+        self.log(WARNING, source, message)
+
+    def error(self, source, message):
+        self.log(ERROR, source, message)
+
+    def accepts(self, entry):
+        """Whether an entry passes the current level/source filter"""
+        return entry.level >= self.min_level and (self.source is None or entry.source == self.source)
+
+    def take_pending(self):
+        """Remove and return the formatted lines logged since the last call"""
+        lines = []
+        pending = self.pending
+        while pending:
+            try:
+                entry = pending.popleft()
+            except IndexError:
+                break
+            if self.accepts(entry):
+                lines.append(entry.format())
+        return lines
+
+    def render(self):
+        """All retained lines that pass the filter, oldest first"""
+        self.pending.clear()
+        return [entry.format() for entry in list(self.entries) if self.accepts(entry)]
+
+    def set_filter(self, min_level=None, source=None):
+        if min_level is not None:
+            self.min_level = min_level
+        self.source = source
+
+    def clear(self):
+        self.entries.clear()
+        self.pending.clear()
@@ -0,0 +1,162 @@
+import asyncio
+import socket
+import time
+from udp_listener import UDPListener, log
+
+
+class _ListenerProtocol(asyncio.DatagramProtocol):
+    """Feeds datagrams from the event loop into an AsyncUDPListener"""
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        try:
+            self.listener._process_packet(data, addr)
+            self.listener._arm_maintenance()
+        except Exception as e:
+            log.exception("Unexpected error in listener: %s", e)
+
+    def error_received(self, exc):
+        self.listener.socket_errors += 1
+        if self.listener.is_listening:
+            log.error("Socket error: %s", exc)
+
+
+class AsyncUDPListener(UDPListener):
+    """UDPListener running on an asyncio event loop instead of its own thread
+
+    The loop can be shared with other coroutines (metrics, timers, control
+    channel). Steps are still injected by the StepInjector thread because
+    key presses block.
+    """
+
+    def __init__(self, key_sender, loop=None):
+        super().__init__(key_sender)
+        self.loop = loop or asyncio.new_event_loop()
+        self.transport = None
+        self.endpoint_task = None
+        self.maintenance_handle = None
+        self.maintenance_at = None
+
+    def start_listening(self):
+        """Start UDP listener
+
+        Works both before the loop runs (the endpoint is created right away)
+        and from inside a running loop (the endpoint is created as a task).
+        """
+        if self.is_listening:
+            log.warning("Listener already running")
+            return False
+
+        try:
+            sock = self._open_socket()
+            sock.setblocking(False)
+        except socket.error as e:
+            log.error("Failed to start UDP listener: %s", e)
+            self.connection_status = f"Error: {e}"
+            self._publish_status()
+            return False
+
+        self.socket = sock
+        self.is_listening = True
+        self.connection_status = "Listening"
+        self.injector.start()
+
+        if self.loop.is_running():
+            self.endpoint_task = self.loop.create_task(self._create_endpoint(sock))
+            self.endpoint_task.add_done_callback(self._endpoint_done)
+        else:
+            self.loop.run_until_complete(self._create_endpoint(sock))
+
+        log.info("UDP Listener started on port %d (asyncio)", self.port)
+        self._publish_status()
+        return True
+
+    async def _create_endpoint(self, sock):
+        """Attach the bound socket to the event loop"""
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _ListenerProtocol(self), sock=sock
+        )
+        self._schedule_maintenance()
+
+    def _endpoint_done(self, task):
+        """Report a failed endpoint task started from inside the running loop"""
+        if self.endpoint_task is task:
+            self.endpoint_task = None
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            log.error("Failed to start UDP listener: %s", exc)
+            self.connection_status = f"Error: {exc}"
+            self._publish_status()
+
+    def _schedule_maintenance(self):
+        """Run maintenance on the event loop and arm the timer for the next deadline"""
+        self.maintenance_handle = None
+        self.maintenance_at = None
+        if not self.is_listening:
+            return
+        self._run_maintenance(time.time())
+        self._arm_maintenance()
+
+    def _arm_maintenance(self):
+        """(Re)arm the maintenance timer if the next deadline moved earlier"""
+        deadline = self._maintenance_deadline()
+        if deadline is None or (self.maintenance_at is not None and self.maintenance_at <= deadline):
+            return
+        if self.maintenance_handle:
+            self.maintenance_handle.cancel()
+        self.maintenance_at = deadline
+        self.maintenance_handle = self.loop.call_later(max(0.0, deadline - time.time()),
+                                                       self._schedule_maintenance)
+
+    def _send_reply(self, payload, addr):
+        if self.transport is None:
+            return False
+        self.transport.sendto(payload, addr)
+        return True
+
+    def stop_listening(self):
+        """Stop UDP listener"""
+        if not self.is_listening:
+            log.warning("Listener not running")
+            return
+
+        self.is_listening = False
+        self.connection_status = "Stopping"
+
+        if self.maintenance_handle:
+            self.maintenance_handle.cancel()
+            self.maintenance_handle = None
+            self.maintenance_at = None
+
+        # An endpoint still being created must not get the socket closed under it
+        if self.endpoint_task is not None:
+            self.endpoint_task.cancel()
+            self.endpoint_task = None
+
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+        elif self.socket:
+            self.socket.close()
+        self.socket = None
+
+        self.injector.stop()
+
+        self.connection_status = "Disconnected"
+        log.info("UDP Listener stopped")
+        self._publish_status()
+
+    def run_forever(self):
+        """Run the event loop until interrupted"""
+        try:
+            self.loop.run_forever()
+        finally:
+            if self.is_listening:
+                self.stop_listening()
+            # Let the transport finish closing before the loop goes away
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
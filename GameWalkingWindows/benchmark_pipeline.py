@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for the GameWalking listener pipeline
+
+Starts the real UDPListener and KeySender on localhost with the in-memory
+recording key backend and simulates N phones walking with configurable cadence, gait
+pattern, jitter, bursts and packet loss. Reports achieved throughput, drop
+rate, queueing delay percentiles and CPU time per packet. Use --json to get
+machine-readable results for tracking regressions between releases.
+
+Examples:
+    python benchmark_pipeline.py --phones 8 --rate 2 --duration 10
+    python benchmark_pipeline.py --phones 20 --rate 50 --gait bursty --loss 0.05 --json results.json
+"""
+
+import argparse
+import contextlib
+import heapq
+import json
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+
+from key_backends import RecordingBackend
+from key_sender import KeySender
+from protocol import build_packet, MSG_STEP, LEGACY_STEP
+from udp_listener import UDPListener
+
+GAITS = ('steady', 'jitter', 'bursty')
+
+
+class Phone:
+    """Simulated phone producing step packets"""
+
+    def __init__(self, device_id, rate, gait, jitter, burst_size, loss, legacy, rng):
+        self.device_id = device_id
+        self.interval = 1.0 / rate
+        self.gait = gait
+        self.jitter = jitter
+        self.burst_size = burst_size
+        self.loss = loss
+        self.legacy = legacy
+        self.rng = rng
+        self.sequence = 0
+        self.sent = 0
+        self.lost = 0
+
+    def next_delay(self):
+        """Seconds until this phone sends its next packet"""
+        if self.gait == 'steady':
+            return self.interval
+        if self.gait == 'jitter':
+            return max(0.0, self.rng.gauss(self.interval, self.interval * self.jitter))
+        # bursty: steps arrive as step-counter catch-ups of burst_size packets
+        if self.sequence % self.burst_size:
+            return 0.0
+        return self.interval * self.burst_size
+
+    def packet(self):
+        """Build the next packet, or None if the network 'loses' it"""
+        self.sequence += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.lost += 1
+            return None
+        self.sent += 1
+        if self.legacy:
+            return LEGACY_STEP
+        return build_packet(MSG_STEP, self.device_id, self.sequence, int(time.monotonic() * 1e6))
+
+
+def generate_load(phones, port, duration, stop_event):
+    """Send packets for every phone on schedule from a single thread"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = ('127.0.0.1', port)
+    start = time.perf_counter()
+    schedule = [(start + phone.rng.random() * phone.interval, i) for i, phone in enumerate(phones)]
+    heapq.heapify(schedule)
+
+    while schedule and not stop_event.is_set():
+        due, i = heapq.heappop(schedule)
+        if due - start > duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        phone = phones[i]
+        payload = phone.packet()
+        if payload is not None:
+            sock.sendto(payload, target)
+        heapq.heappush(schedule, (due + phone.next_delay(), i))
+
+    sock.close()
+
+
+def run_benchmark(args):
+    """Run one benchmark and return the results dict"""
+    rng = random.Random(args.seed)
+    phones = [Phone(i + 1, args.rate, args.gait, args.jitter, args.burst, args.loss, args.legacy,
+                    random.Random(rng.random()))
+              for i in range(args.phones)]
+
+    backend = RecordingBackend()
+    key_sender = KeySender(backend)
+    key_sender.key_hold_duration = args.hold
+    key_sender.release_gap = 0.0
+    key_sender.step_duration = 0.0  # Measure the pipeline, not per-device pacing
+    key_sender.debug_mode = False
+    key_sender.activate()
+    listener = UDPListener(key_sender)
+    listener.port = args.port
+    listener.receive_engine = args.engine
+    listener.debug_mode = False
+    listener.injector.debug_mode = False
+    if args.queue_size:
+        listener.step_queue.maxsize = args.queue_size
+    if args.policy:
+        listener.step_queue.overflow_policy = args.policy
+
+    if not listener.start_listening():
+        sys.exit(1)
+    time.sleep(0.2)
+
+    stop_event = threading.Event()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    generator = threading.Thread(target=generate_load, args=(phones, args.port, args.duration, stop_event))
+    generator.start()
+    generator.join()
+
+    # Give the pipeline time to drain
+    sent = sum(phone.sent for phone in phones)
+    drain_deadline = time.perf_counter() + 5.0
+    while time.perf_counter() < drain_deadline:
+        queue_empty = listener.step_queue.depth() == 0
+        if listener.steps_received >= sent and queue_empty:
+            break
+        time.sleep(0.01)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    status = listener.get_status()
+    listener.stop_listening()
+
+    received = status['steps_received']
+    injected = backend.presses()
+    queue_delay = status['latency']['queue']
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'phones': args.phones, 'rate': args.rate, 'gait': args.gait, 'jitter': args.jitter,
+            'burst': args.burst, 'loss': args.loss, 'legacy': args.legacy, 'duration': args.duration,
+            'engine': args.engine, 'hold': args.hold,
+            'queue_size': listener.step_queue.maxsize, 'policy': listener.step_queue.overflow_policy
+        },
+        'sent': sent,
+        'simulated_loss': sum(phone.lost for phone in phones),
+        'received': received,
+        'injected': injected,
+        'receive_drop_rate': 1.0 - received / sent if sent else 0.0,
+        'queue_dropped': status['queue_dropped'],
+        'queue_coalesced': status['queue_coalesced'],
+        'throughput_steps_per_sec': injected / wall if wall > 0 else 0.0,
+        'queue_delay_ms': {k: v for k, v in queue_delay.items() if k != 'count'},
+        'cpu_us_per_packet': cpu * 1e6 / received if received else 0.0,
+        'wall_seconds': wall
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GameWalking pipeline throughput benchmark')
+    parser.add_argument('--phones', type=int, default=4, help='Number of simulated phones')
+    parser.add_argument('--rate', type=float, default=2.0, help='Steps per second per phone')
+    parser.add_argument('--gait', choices=GAITS, default='steady', help='Step timing pattern')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Relative interval jitter (jitter gait)')
+    parser.add_argument('--burst', type=int, default=5, help='Packets per burst (bursty gait)')
+    parser.add_argument('--loss', type=float, default=0.0, help='Simulated packet loss probability')
+    parser.add_argument('--legacy', action='store_true', help='Send plain-text STEP instead of protocol v2')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of load')
+    parser.add_argument('--engine', choices=['simple', 'batched'], default='simple', help='Receive engine')
+    parser.add_argument('--queue-size', type=int, default=0, help='Override step queue size')
+    parser.add_argument('--policy', choices=['drop_oldest', 'coalesce', 'block'], help='Override overflow policy')
+    parser.add_argument('--hold', type=float, default=0.0, help='Simulated seconds per key injection')
+    parser.add_argument('--port', type=int, default=9101, help='Local UDP port to use')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--json', metavar='FILE', help="Write results as JSON ('-' for stdout)")
+
+    args = parser.parse_args()
+
+    # Keep stdout clean for machine-readable output
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run_benchmark(args)
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print()
+    print(f"Sent:        {results['sent']} packets ({results['simulated_loss']} lost in simulation)")
+    print(f"Received:    {results['received']} steps ({results['receive_drop_rate'] * 100:.2f}% dropped)")
+    print(f"Injected:    {results['injected']} steps, queue dropped {results['queue_dropped']}, "
+          f"coalesced {results['queue_coalesced']}")
+    print(f"Throughput:  {results['throughput_steps_per_sec']:.0f} steps/s")
+    delay = results['queue_delay_ms']
+    print(f"Queue delay: p50 {delay['p50_ms']:.2f} ms, p95 {delay['p95_ms']:.2f} ms, "
+          f"p99 {delay['p99_ms']:.2f} ms, max {delay['max_ms']:.2f} ms")
+    print(f"CPU:         {results['cpu_us_per_packet']:.1f} us/packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Receive engine benchmark for GameWalking
+
+Runs the real UDPListener on localhost with each receive engine, floods it
+with numbered STEP datagrams and reports the packets received and lost
+(overrun before the listener read them), packets/sec, CPU time per packet and
+peak traced memory per packet (measured with tracemalloc in a separate run).
+
+Usage: python benchmark_receive.py [packets] [port]
+"""
+
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+from key_backends import RecordingBackend
+from key_sender import KeySender
+from protocol import build_packet, MSG_STEP
+from udp_listener import UDPListener
+
+
+def send_packets(port, packets, burst=64):
+    """Send packets in bursts, pausing briefly so the kernel buffer does not overflow"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # A new sequence number and sender time per packet, or the listener
+    # drops them as duplicates or stale steps
+    for sent in range(0, packets, burst):
+        for sequence in range(sent, min(sent + burst, packets)):
+            sock.sendto(build_packet(MSG_STEP, 1, sequence, int(time.monotonic() * 1e6)), ('127.0.0.1', port))
+        time.sleep(0)
+    sock.close()
+
+
+def run_engine(engine, packets, port, trace=False):
+    """Benchmark one receive engine and return its results"""
+    # An inactive key sender discards steps so only the receive path is measured
+    listener = UDPListener(KeySender(RecordingBackend()))
+    listener.port = port
+    listener.receive_engine = engine
+    listener.debug_mode = False
+
+    listener.start_listening()
+    time.sleep(0.2)
+
+    if trace:
+        tracemalloc.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    sender = threading.Thread(target=send_packets, args=(port, packets))
+    sender.start()
+    sender.join()
+
+    # Wait until everything arrived or the listener stops making progress
+    received = -1
+    last_progress = time.perf_counter()
+    while listener.steps_received < packets and received != listener.steps_received:
+        received = listener.steps_received
+        last_progress = time.perf_counter()
+        time.sleep(0.05)
+
+    wall = last_progress - wall_start
+    cpu = time.process_time() - cpu_start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    received = listener.steps_received
+    lost = listener.packets_lost
+    listener.stop_listening()
+
+    return {
+        'engine': engine,
+        'received': received,
+        'lost': lost,
+        'packets_per_sec': received / wall if wall > 0 else 0.0,
+        'cpu_us_per_packet': cpu * 1e6 / received if received else 0.0,
+        'peak_bytes_per_packet': peak / received if received else 0.0
+    }
+
+
+def main():
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 9100
+
+    print(f"Sending {packets} packets per engine to 127.0.0.1:{port}")
+    results = []
+    for engine in ('simple', 'batched'):
+        result = run_engine(engine, packets, port)
+        # tracemalloc slows everything down, so measure memory in a separate run
+        result['peak_bytes_per_packet'] = run_engine(engine, packets, port, trace=True)['peak_bytes_per_packet']
+        results.append(result)
+
+    print()
+    print(f"{'engine':<10}{'received':>10}{'lost':>10}{'pkt/s':>12}{'cpu us/pkt':>12}{'peak B/pkt':>12}")
+    for r in results:
+        print(f"{r['engine']:<10}{r['received']:>10}{r['lost']:>10}{r['packets_per_sec']:>12.0f}"
+              f"{r['cpu_us_per_packet']:>12.2f}{r['peak_bytes_per_packet']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the sharded multi-process listener
+
+Floods the ShardedUDPListener from several sender processes, each using many
+source sockets so SO_REUSEPORT can spread them, and reports received packets
+per second for 1 to N worker processes. Keys are not pressed (the key sender
+stays inactive), so only the receive, parse and aggregation path is measured.
+Use --json for machine-readable output.
+
+Usage: python benchmark_sharded.py [--max-workers 4] [--packets 200000] [--json FILE]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import time
+
+from key_backends import RecordingBackend
+from key_sender import KeySender
+from protocol import build_packet, MSG_STEP
+from sharded import ShardedUDPListener
+
+
+def send_packets(port, packets, sockets, first_device, burst=64):
+    """Sender process: round-robin packets over `sockets` source ports"""
+    senders = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(sockets)]
+    sequence = [0] * sockets
+    target = ('127.0.0.1', port)
+    for sent in range(packets):
+        i = sent % sockets
+        # Real send times, so the listener's stale check does not drop the steps
+        payload = build_packet(MSG_STEP, first_device + i, sequence[i], int(time.monotonic() * 1e6))
+        sequence[i] += 1
+        senders[i].sendto(payload, target)
+        if sent % burst == burst - 1:
+            time.sleep(0)
+    for sender in senders:
+        sender.close()
+
+
+def run_workers(workers, args):
+    """Benchmark one worker count and return its results"""
+    key_sender = KeySender(RecordingBackend())
+    key_sender.step_duration = 0.0
+    listener = ShardedUDPListener(key_sender, workers)
+    listener.port = args.port
+    listener.debug_mode = False
+    listener.injector.debug_mode = False
+
+    if not listener.start_listening():
+        sys.exit(1)
+    time.sleep(1.0)  # Let the workers bind
+
+    per_sender = args.packets // args.senders
+    senders = [multiprocessing.Process(target=send_packets,
+                                       args=(args.port, per_sender, args.sockets, i * args.sockets))
+               for i in range(args.senders)]
+    wall_start = time.perf_counter()
+    for sender in senders:
+        sender.start()
+
+    # Wait until everything arrived or the listener stops making progress
+    total = per_sender * args.senders
+    received = -1
+    last_progress = time.perf_counter()
+    while listener.steps_received < total:
+        if listener.steps_received != received:
+            received = listener.steps_received
+            last_progress = time.perf_counter()
+        elif time.perf_counter() - last_progress > 1.0:
+            break
+        time.sleep(0.01)
+    else:
+        last_progress = time.perf_counter()
+    wall = last_progress - wall_start
+
+    for sender in senders:
+        sender.join()
+    received = listener.steps_received
+    stale = listener.get_status()['steps_stale']
+    listener.stop_listening()
+
+    return {
+        'workers': listener.workers,
+        'sent': total,
+        'received': received,
+        'loss': 1.0 - received / total if total else 0.0,
+        'stale': stale,
+        'packets_per_sec': received / wall if wall > 0 else 0.0,
+        'wall_seconds': wall
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GameWalking sharded listener scaling benchmark')
+    parser.add_argument('--max-workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Benchmark 1..N worker processes')
+    parser.add_argument('--packets', type=int, default=200000, help='Packets per run')
+    parser.add_argument('--senders', type=int, default=2, help='Sender processes')
+    parser.add_argument('--sockets', type=int, default=16, help='Source sockets (phones) per sender')
+    parser.add_argument('--port', type=int, default=9103, help='Local UDP port to use')
+    parser.add_argument('--json', metavar='FILE', help="Write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    # Keep stdout clean for machine-readable output
+    runs = []
+    with contextlib.redirect_stdout(sys.stderr):
+        for workers in range(1, args.max_workers + 1):
+            runs.append(run_workers(workers, args))
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': {'packets': args.packets, 'senders': args.senders, 'sockets': args.sockets},
+        'runs': runs
+    }
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print()
+    print(f"{'workers':>8}{'packets/s':>12}{'loss':>8}{'stale':>8}{'speedup':>9}")
+    base = runs[0]['packets_per_sec'] or 1.0
+    for run in runs:
+        print(f"{run['workers']:>8}{run['packets_per_sec']:>12.0f}{run['loss'] * 100:>7.1f}%{run['stale']:>8}"
+              f"{run['packets_per_sec'] / base:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
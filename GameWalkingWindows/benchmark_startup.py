@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark for GameWalking console mode
+
+Launches `main.py --no-gui` as a fresh process and measures the time until
+the first STEP packet has been handled (time to first packet). The process
+runs in a temporary directory so the real gamewalking_config.ini is never
+touched. Use --json for machine-readable output.
+
+Usage: python benchmark_startup.py [--runs 5] [--engine thread|asyncio] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def time_to_first_packet(port, engine, timeout=30.0):
+    """Start main.py and return seconds until it reports the first handled step"""
+    with tempfile.TemporaryDirectory() as workdir:
+        command = [sys.executable, '-u', MAIN, '--no-gui', '--debug', '--port', str(port),
+                   '--engine', engine, '--key-backend', 'recording']
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True)
+        handled = threading.Event()
+
+        def watch_output():
+            for line in process.stdout:
+                if 'Step #1 ' in line:
+                    handled.set()
+                    return
+
+        threading.Thread(target=watch_output, daemon=True).start()
+
+        # Keep sending until the listener is up and handles one
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        elapsed = None
+        while time.perf_counter() - start < timeout:
+            sock.sendto(b'STEP', ('127.0.0.1', port))
+            if handled.wait(0.002):
+                elapsed = time.perf_counter() - start
+                break
+        sock.close()
+
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GameWalking startup time benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts')
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread', help='Listener engine')
+    parser.add_argument('--port', type=int, default=9102, help='Local UDP port to use')
+    parser.add_argument('--json', metavar='FILE', help="Write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    samples = []
+    for run in range(args.runs):
+        elapsed = time_to_first_packet(args.port, args.engine)
+        if elapsed is None:
+            print(f"Run {run + 1}: no packet handled", file=sys.stderr)
+            continue
+        samples.append(elapsed)
+        print(f"Run {run + 1}: {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+    if not samples:
+        sys.exit(1)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'engine': args.engine,
+        'runs': len(samples),
+        'min_ms': min(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'max_ms': max(samples) * 1000
+    }
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print(f"Time to first packet: min {results['min_ms']:.1f} ms, "
+          f"median {results['median_ms']:.1f} ms, max {results['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Packet capture file format
+
+A capture is an append-only sequence of records after an 8-byte file magic.
+Every record starts with a one-byte tag:
+
+    SEGMENT  tag 0  double monotonic time, double wall-clock time
+                    Starts a new recording session; resets the time base
+                    and the source table.
+    SOURCE   tag 1  uint16 index, uint16 port, uint8 length, IP address
+                    Assigns a short index to a sender address.
+    PACKET   tag 2  uint32 microseconds since the previous record,
+                    uint16 source index, uint16 length, datagram bytes
+
+Senders and absolute times are written once, so a typical step datagram
+costs 9 bytes of overhead. Readers stop at a truncated final record, so a
+capture cut short by a crash stays readable.
+"""
+
+import mmap
+import struct
+import time
+
+MAGIC = b'GWCAP1\n\x00'
+
+TAG_SEGMENT = 0
+TAG_SOURCE = 1
+TAG_PACKET = 2
+
+SEGMENT = struct.Struct('!Bdd')
+SOURCE = struct.Struct('!BHHB')
+PACKET = struct.Struct('!BIHH')
+MAX_DELTA_US = 0xFFFFFFFF
+
+
+class CaptureWriter:
+    """Appends received datagrams to a capture file
+
+    Only called from the receive thread; flush() is cheap and runs from the
+    listener's periodic maintenance.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.sources = {}
+        self.packets = 0
+        self._start_segment(time.monotonic())
+
+    def _start_segment(self, now):
+        self.sources.clear()
+        self.last_time = now
+        self.file.write(SEGMENT.pack(TAG_SEGMENT, now, time.time()))
+
+    def write(self, data, addr, length=None, now=None):
+        """Record one datagram (bytes, bytearray or memoryview)"""
+        if length is None:
+            length = len(data)
+        if now is None:
+            now = time.monotonic()
+
+        delta = int((now - self.last_time) * 1e6)
+        if delta > MAX_DELTA_US:
+            self._start_segment(now)
+            delta = 0
+        self.last_time += delta / 1e6
+
+        index = self.sources.get(addr)
+        if index is None:
+            index = len(self.sources)
+            if index > 0xFFFF:
+                self._start_segment(now)
+                index = 0
+            self.sources[addr] = index
+            host = addr[0].encode('ascii')
+            self.file.write(SOURCE.pack(TAG_SOURCE, index, addr[1], len(host)) + host)
+
+        self.file.write(PACKET.pack(TAG_PACKET, max(delta, 0), index, length))
+        self.file.write(data[:length])
+        self.packets += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_capture(path):
+    """Yield (seconds since the first packet, addr, datagram memoryview) for every packet
+
+    The file is memory-mapped and the datagrams are zero-copy views into it;
+    copy them with bytes() to keep them after the iteration ends.
+    """
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) <= len(MAGIC):
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    try:
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a GameWalking capture")
+        yield from _records(view)
+    finally:
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # A caller still holds a datagram view, the map is freed with it
+
+
+def _records(view):
+    size = len(view)
+    offset = len(MAGIC)
+    sources = {}
+    clock = None
+    first = None
+
+    while offset < size:
+        tag = view[offset]
+        if tag == TAG_PACKET:
+            if offset + PACKET.size > size:
+                break
+            _, delta, index, length = PACKET.unpack_from(view, offset)
+            start = offset + PACKET.size
+            if start + length > size:
+                break
+            clock += delta / 1e6
+            if first is None:
+                first = clock
+            yield clock - first, sources[index], view[start:start + length]
+            offset = start + length
+        elif tag == TAG_SOURCE:
+            if offset + SOURCE.size > size:
+                break
+            _, index, port, host_length = SOURCE.unpack_from(view, offset)
+            start = offset + SOURCE.size
+            if start + host_length > size:
+                break
+            sources[index] = (bytes(view[start:start + host_length]).decode('ascii'), port)
+            offset = start + host_length
+        elif tag == TAG_SEGMENT:
+            if offset + SEGMENT.size > size:
+                break
+            _, monotonic, wall = SEGMENT.unpack_from(view, offset)
+            # Segments are laid end to end; gaps between recording sessions are dropped
+            if first is not None:
+                first += monotonic - clock
+            clock = monotonic
+            sources.clear()
+            offset += SEGMENT.size
+        else:
+            raise ValueError(f"Corrupt capture record at offset {offset}")
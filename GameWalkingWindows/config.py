@@ -1,10 +1,41 @@
+import atexit
 import configparser
+import logging
 import os
+import threading
+
+log = logging.getLogger('gamewalking.config')
+
+_shared_config = None
+_shared_lock = threading.Lock()
+
+
+def get_config():
+    """Return the process-wide Config, loading it on first use"""
+    global _shared_config
+    with _shared_lock:
+        if _shared_config is None:
+            _shared_config = Config()
+            atexit.register(_shared_config.flush)
+        return _shared_config
+
 
 class Config:
-    def __init__(self):
+    def __init__(self, save_delay=0.5):
         self.config = configparser.ConfigParser()
         self.config_file = 'gamewalking_config.ini'
+        self.lock = threading.RLock()
+        
+        # Typed values are parsed once and cached until the key changes
+        self.cache = {}
+        # Runtime-only values (e.g. --debug) that are never written to disk
+        self.overrides = {}
+        self.subscribers = []
+        
+        # Writes are coalesced and flushed save_delay seconds after the last set()
+        self.save_delay = save_delay
+        self.save_timer = None
+        
         self.load_config()
     
     def load_config(self):
@@ -18,47 +49,174 @@ class Config:
         """Create default configuration"""
         self.config['NETWORK'] = {
             'port': '9000',
-            'buffer_size': '1024'
+            'buffer_size': '1024',
+            'receive_engine': 'simple',
+            'batch_size': '32',
+            'session_timeout': '30',
+            'liveness_timeout': '10',
+            'stale_after': '0.5',
+            'answer_pings': 'true',
+            'workers': '0',
+            'recv_buffer': '0',
+            'shed_threshold': '0',
+            'shed_policy': 'none',
+            'metrics_port': '0',
+            'metrics_host': '127.0.0.1'
         }
         
         self.config['CONTROLS'] = {
             'forward_key': 'w',
             'step_duration': '0.1',
-            'key_hold_duration': '0.05'
+            'step_burst': '4',
+            'key_hold_duration': '0.05',
+            'movement_mode': 'tap',
+            'max_taps': '4',
+            'min_cadence': '1.0',
+            'release_factor': '1.5',
+            'key_backend': 'pyautogui',
+            'pyautogui_pause': '0.01',
+            'release_gap': '0.01'
+        }
+        
+        self.config['QUEUE'] = {
+            'max_size': '64',
+            'overflow_policy': 'drop_oldest'
+        }
+        
+        self.config['HISTORY'] = {
+            'file': '',
+            'capacity': '4096',
+            'cadence_window': '10',
+            'flush_interval': '30'
+        }
+        
+        self.config['LOGGING'] = {
+            'format': 'text',
+            'file': '',
+            'file_max_bytes': '1048576',
+            'file_backups': '3',
+            'sample_every': '1',
+            'rate_limit': '20',
+            'queue_size': '10000'
         }
         
         self.config['GENERAL'] = {
             'minimize_to_tray': 'true',
             'auto_start': 'false',
-            'debug_mode': 'false'
+            'debug_mode': 'false',
+            'gui_refresh_hz': '10',
+            'log_level': 'INFO',
+            'log_lines': '1000'
         }
         
         self.save_config()
     
     def save_config(self):
-        """Save configuration to file"""
-        with open(self.config_file, 'w') as configfile:
-            self.config.write(configfile)
+        """Save configuration to file atomically"""
+        with self.lock:
+            temp_file = self.config_file + '.tmp'
+            with open(temp_file, 'w') as configfile:
+                self.config.write(configfile)
+            os.replace(temp_file, self.config_file)
+    
+    def schedule_save(self):
+        """Save after save_delay seconds, restarting the delay on every call"""
+        with self.lock:
+            if self.save_timer:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(self.save_delay, self._save_now)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+    
+    def _save_now(self):
+        with self.lock:
+            self.save_timer = None
+        try:
+            self.save_config()
+        except OSError as e:
+            log.error("Failed to save configuration: %s", e)
+    
+    def flush(self):
+        """Write any pending changes immediately"""
+        with self.lock:
+            pending = self.save_timer is not None
+            if pending:
+                self.save_timer.cancel()
+        if pending:
+            self._save_now()
+    
+    def _lookup(self, kind, section, key, fallback):
+        cache_key = (kind, section, key, fallback)
+        try:
+            return self.cache[cache_key]
+        except KeyError:
+            pass
+        
+        with self.lock:
+            if (section, key) in self.overrides:
+                parser = configparser.ConfigParser()
+                parser[section] = {key: self.overrides[(section, key)]}
+            else:
+                parser = self.config
+            
+            if kind == 'str':
+                value = parser.get(section, key, fallback=fallback)
+            elif kind == 'int':
+                value = parser.getint(section, key, fallback=fallback)
+            elif kind == 'float':
+                value = parser.getfloat(section, key, fallback=fallback)
+            else:
+                value = parser.getboolean(section, key, fallback=fallback)
+            
+            self.cache[cache_key] = value
+            return value
     
     def get(self, section, key, fallback=None):
         """Get configuration value"""
-        return self.config.get(section, key, fallback=fallback)
+        return self._lookup('str', section, key, fallback)
     
     def getint(self, section, key, fallback=None):
         """Get integer configuration value"""
-        return self.config.getint(section, key, fallback=fallback)
+        return self._lookup('int', section, key, fallback)
     
     def getfloat(self, section, key, fallback=None):
         """Get float configuration value"""
-        return self.config.getfloat(section, key, fallback=fallback)
+        return self._lookup('float', section, key, fallback)
     
     def getboolean(self, section, key, fallback=None):
         """Get boolean configuration value"""
-        return self.config.getboolean(section, key, fallback=fallback)
+        return self._lookup('bool', section, key, fallback)
+    
+    def set(self, section, key, value, persist=True):
+        """Set configuration value and notify subscribers
+
+        With persist=False the value only lives for this process; a later
+        persisted set() of the same key replaces it.
+        """
+        value = str(value)
+        with self.lock:
+            if persist:
+                if not self.config.has_section(section):
+                    self.config.add_section(section)
+                self.config.set(section, key, value)
+                self.overrides.pop((section, key), None)
+            else:
+                self.overrides[(section, key)] = value
+            self.cache.clear()
+            subscribers = list(self.subscribers)
+        
+        if persist:
+            self.schedule_save()
+        
+        for callback, wanted_section in subscribers:
+            if wanted_section is None or wanted_section == section:
+                callback(section, key, value)
+    
+    def subscribe(self, callback, section=None):
+        """Call callback(section, key, value) after every set() (optionally one section)"""
+        with self.lock:
+            self.subscribers.append((callback, section))
     
-    def set(self, section, key, value):
-        """Set configuration value"""
-        if not self.config.has_section(section):
-            self.config.add_section(section)
-        self.config.set(section, key, str(value))
-        self.save_config()
\ No newline at end of file
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [(cb, sec) for cb, sec in self.subscribers if cb != callback]
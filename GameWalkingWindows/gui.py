@@ -3,8 +3,8 @@ from tkinter import ttk, messagebox
 import threading
 import time
 from datetime import datetime
-import pystray
-from PIL import Image, ImageDraw
+from activity_log import ActivityLog, LEVELS, LEVEL_NAMES, INFO, ERROR
+import spans
 import os
 import sys
 
@@ -16,14 +16,32 @@ class GameWalkingGUI:
         self.root = tk.Tk()
         self.is_minimized_to_tray = False
         
+        # Status refresh: capped rate, redraw only when the listener reports a change
+        refresh_hz = max(1, self.config.getint('GENERAL', 'gui_refresh_hz', 10))
+        self.refresh_interval_ms = int(1000 / refresh_hz)
+        self.shown_status_version = -1
+        self.last_full_refresh = 0.0
+        self.label_cache = {}
+        
+        # Activity log: written from any thread, flushed into the Text widget in batches
+        self.max_log_lines = self.config.getint('GENERAL', 'log_lines', 1000)
+        self.log_lines = 0
+        self.activity_log = ActivityLog(
+            self.max_log_lines,
+            LEVELS.get(self.config.get('GENERAL', 'log_level', 'INFO').upper(), INFO)
+        )
+        self.udp_listener.activity_log = self.activity_log
+        
         # Set up the main window
         self.setup_window()
         self.create_widgets()
         self.load_settings()
-        self.setup_tray()
+        # The tray icon (pystray/PIL) is created on first minimize
+        self.tray_icon = None
         
-        # Status update timer
+        # Status update and log flush timers
         self.update_status_timer()
+        self.flush_log_timer()
         
     def setup_window(self):
         """Set up main window properties"""
@@ -76,6 +94,19 @@ class GameWalkingGUI:
         self.last_step_label = ttk.Label(status_frame, text="Never")
         self.last_step_label.grid(row=3, column=1, sticky=tk.W)
         
+        ttk.Label(status_frame, text="Devices:").grid(row=4, column=0, sticky=tk.W, padx=(0, 10))
+        self.devices_label = ttk.Label(status_frame, text="None")
+        self.devices_label.grid(row=4, column=1, sticky=tk.W)
+        
+        ttk.Label(status_frame, text="Latency p50/p95/p99:").grid(row=5, column=0, sticky=tk.W, padx=(0, 10))
+        self.latency_label = ttk.Label(status_frame, text="-")
+        self.latency_label.grid(row=5, column=1, sticky=tk.W)
+        
+        # Filled in by link probes: test_network.py --probe from another device, or Test Link
+        ttk.Label(status_frame, text="Link (probe):").grid(row=6, column=0, sticky=tk.W, padx=(0, 10))
+        self.link_label = ttk.Label(status_frame, text="-")
+        self.link_label.grid(row=6, column=1, sticky=tk.W)
+        
         # Control Buttons Frame
         control_frame = ttk.LabelFrame(main_frame, text="Controls", padding="10")
         control_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -98,6 +129,10 @@ class GameWalkingGUI:
                                      command=self.test_key)
         self.test_button.grid(row=1, column=1, padx=(5, 0), pady=(0, 5), sticky=(tk.W, tk.E))
         
+        self.link_test_button = ttk.Button(control_frame, text="Test Link",
+                                          command=self.test_link)
+        self.link_test_button.grid(row=2, column=0, columnspan=2, pady=(0, 5), sticky=(tk.W, tk.E))
+        
         # Settings Frame
         settings_frame = ttk.LabelFrame(main_frame, text="Settings", padding="10")
         settings_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -134,8 +169,26 @@ class GameWalkingGUI:
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
-        # Clear log button
-        ttk.Button(log_frame, text="Clear Log", command=self.clear_log).grid(row=1, column=0, pady=(5, 0))
+        # Log filter and clear button
+        log_controls = ttk.Frame(log_frame)
+        log_controls.grid(row=1, column=0, columnspan=2, pady=(5, 0))
+        
+        ttk.Label(log_controls, text="Level:").grid(row=0, column=0, padx=(0, 5))
+        self.log_level_var = tk.StringVar(value=LEVEL_NAMES[self.activity_log.min_level])
+        level_box = ttk.Combobox(log_controls, textvariable=self.log_level_var, width=9, state="readonly",
+                                 values=[LEVEL_NAMES[level] for level in sorted(LEVEL_NAMES)])
+        level_box.grid(row=0, column=1, padx=(0, 10))
+        level_box.bind("<<ComboboxSelected>>", self.apply_log_filter)
+        
+        ttk.Label(log_controls, text="Source:").grid(row=0, column=2, padx=(0, 5))
+        self.log_source_var = tk.StringVar(value="all")
+        self.log_source_box = ttk.Combobox(log_controls, textvariable=self.log_source_var, width=9,
+                                           state="readonly", values=["all"],
+                                           postcommand=self.refresh_log_sources)
+        self.log_source_box.grid(row=0, column=3, padx=(0, 10))
+        self.log_source_box.bind("<<ComboboxSelected>>", self.apply_log_filter)
+        
+        ttk.Button(log_controls, text="Clear Log", command=self.clear_log).grid(row=0, column=4)
         
         # Minimize to tray checkbox
         self.minimize_to_tray_var = tk.BooleanVar()
@@ -166,6 +219,9 @@ class GameWalkingGUI:
     
     def setup_tray(self):
         """Set up system tray icon"""
+        import pystray
+        from PIL import Image, ImageDraw
+        
         # Create tray icon image
         image = Image.new('RGB', (64, 64), color='blue')
         draw = ImageDraw.Draw(image)
@@ -212,6 +268,35 @@ class GameWalkingGUI:
         self.key_sender.test_key()
         self.log_message(f"Test key sent: {self.key_sender.forward_key}")
     
+    def test_link(self):
+        """Probe the running listener over loopback without blocking the window"""
+        if not self.udp_listener.is_listening:
+            messagebox.showinfo("Test Link", "Start the listener first. To test the Wi-Fi link, run "
+                                "'python test_network.py --probe <this PC's IP>' on another device "
+                                "on the same network; the results show up here.")
+            return
+        
+        self.link_test_button.config(state="disabled")
+        self.log_message("Testing link to the listener...")
+        self.link_test_thread = threading.Thread(target=self._run_link_test, args=(self.udp_listener.port,),
+                                                 daemon=True)
+        self.link_test_thread.start()
+        self.root.after(200, self._poll_link_test)
+    
+    def _run_link_test(self, port):
+        from net_probe import run_probe, format_probe
+        try:
+            self.log_message(f"Link test: {format_probe(run_probe('127.0.0.1', port, 50.0, 100))}")
+        except OSError as e:
+            self.log_message(f"Link test failed: {e}", ERROR)
+    
+    def _poll_link_test(self):
+        """Re-enable the Test Link button once the probe thread is done"""
+        if self.link_test_thread.is_alive():
+            self.root.after(200, self._poll_link_test)
+        else:
+            self.link_test_button.config(state="normal")
+    
     def save_settings(self):
         """Save current settings"""
         try:
@@ -246,45 +331,119 @@ class GameWalkingGUI:
         except ValueError as e:
             messagebox.showerror("Error", f"Invalid settings: {e}")
     
+    def set_label(self, label, text, foreground=None):
+        """Reconfigure a label only if its text or colour actually changed"""
+        value = (text, foreground)
+        if self.label_cache.get(label) == value:
+            return
+        self.label_cache[label] = value
+        if foreground is None:
+            label.config(text=text)
+        else:
+            label.config(text=text, foreground=foreground)
+    
     def update_status(self, status_info):
         """Update status display with info from UDP listener"""
         if status_info['is_listening']:
-            self.status_label.config(text=status_info['connection_status'], foreground="green")
+            self.set_label(self.status_label, status_info['connection_status'], "green")
         else:
-            self.status_label.config(text="Disconnected", foreground="red")
+            self.set_label(self.status_label, "Disconnected", "red")
         
-        self.steps_label.config(text=str(status_info['steps_received']))
+        self.set_label(self.steps_label, str(status_info['steps_received']))
         
         if status_info['last_step_time'] > 0:
             last_step = datetime.fromtimestamp(status_info['last_step_time'])
-            self.last_step_label.config(text=last_step.strftime("%H:%M:%S"))
+            self.set_label(self.last_step_label, last_step.strftime("%H:%M:%S"))
         else:
-            self.last_step_label.config(text="Never")
+            self.set_label(self.last_step_label, "Never")
+        
+        if 'sessions' in status_info:
+            devices = [f"{d['device']} ({d['steps']})" for d in status_info['sessions']]
+            self.set_label(self.devices_label, ", ".join(devices) if devices else "None")
+        
+        if 'latency' in status_info:
+            total = status_info['latency']['total']
+            if total['count']:
+                self.set_label(self.latency_label, f"{total['p50_ms']:.1f} / {total['p95_ms']:.1f} / "
+                                                   f"{total['p99_ms']:.1f} ms (max {total['max_ms']:.1f})")
+            else:
+                self.set_label(self.latency_label, "-")
+        
+        probe = status_info.get('link_probe')
+        if probe:
+            text = (f"RTT {probe['rtt_p50_ms']:.1f} / {probe['rtt_p95_ms']:.1f} ms, "
+                    f"jitter {probe['jitter_ms']:.1f} ms, loss {probe['loss'] * 100:.1f}%, "
+                    f"reordered {probe['reordered']} ({probe['source']})")
+            self.set_label(self.link_label, text, "red" if probe['loss'] > 0.02 else "green")
     
     def update_status_timer(self):
-        """Timer to update status regularly"""
-        status = self.udp_listener.get_status()
-        self.update_status(status)
+        """Timer to update status at a capped rate, coalescing any number of steps into one redraw"""
+        version = self.udp_listener.status_version
+        now = time.monotonic()
+        
+        # Redraw when the listener published a change, and once a second for
+        # values that move on their own (idle devices, latency)
+        if version != self.shown_status_version or now - self.last_full_refresh >= 1.0:
+            self.shown_status_version = version
+            self.last_full_refresh = now
+            tracer = spans.TRACER
+            if tracer is not None:
+                start = time.perf_counter()
+            self.update_status(self.udp_listener.get_status())
+            if tracer is not None:
+                tracer.record('gui_update', start)
         
         # Schedule next update
-        self.root.after(1000, self.update_status_timer)
+        self.root.after(self.refresh_interval_ms, self.update_status_timer)
+    
+    def log_message(self, message, level=INFO, source='gui'):
+        """Add message to activity log (safe from any thread)"""
+        self.activity_log.log(level, source, message)
     
-    def log_message(self, message):
-        """Add message to activity log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
+    def flush_log_timer(self):
+        """Timer that writes pending log lines into the Text widget in one batch"""
+        lines = self.activity_log.take_pending()
+        if lines:
+            tracer = spans.TRACER
+            if tracer is not None:
+                start = time.perf_counter()
+            self.append_log_lines(lines)
+            if tracer is not None:
+                tracer.record('gui_log', start)
+        self.root.after(200, self.flush_log_timer)
+    
+    def append_log_lines(self, lines):
+        """Insert lines at the end and trim the oldest ones past max_log_lines"""
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        self.log_lines += len(lines)
+        
+        if self.log_lines > self.max_log_lines:
+            excess = self.log_lines - self.max_log_lines
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_lines = self.max_log_lines
         
-        self.log_text.insert(tk.END, log_entry)
         self.log_text.see(tk.END)
+    
+    def refresh_log_sources(self):
+        """Offer every source seen so far in the source filter"""
+        self.log_source_box.config(values=["all"] + sorted(self.activity_log.sources))
+    
+    def apply_log_filter(self, event=None):
+        """Re-render the retained log with the selected level/source filter"""
+        source = self.log_source_var.get()
+        self.activity_log.set_filter(LEVELS[self.log_level_var.get()], None if source == "all" else source)
         
-        # Limit log size (keep last 1000 lines)
-        lines = self.log_text.get("1.0", tk.END).split('\n')
-        if len(lines) > 1000:
-            self.log_text.delete("1.0", f"{len(lines)-1000}.0")
+        self.log_text.delete("1.0", tk.END)
+        self.log_lines = 0
+        lines = self.activity_log.render()
+        if lines:
+            self.append_log_lines(lines)
     
     def clear_log(self):
         """Clear activity log"""
+        self.activity_log.clear()
         self.log_text.delete("1.0", tk.END)
+        self.log_lines = 0
     
     def on_closing(self):
         """Handle window close event"""
@@ -298,6 +457,9 @@ class GameWalkingGUI:
         self.root.withdraw()
         self.is_minimized_to_tray = True
         
+        if self.tray_icon is None:
+            self.setup_tray()
+        
         # Start tray icon in separate thread
         threading.Thread(target=self.tray_icon.run, daemon=True).start()
     
@@ -0,0 +1,41 @@
+"""
+Kernel-side statistics for the listener's UDP socket
+
+Linux keeps a per-socket count of datagrams dropped because the receive
+buffer was full, plus the bytes currently queued, in /proc/net/udp(6). The
+row is found through the socket's inode. Other systems have no per-socket
+counter, so the helpers return None there.
+
+SO_RXQ_OVFL would deliver the same counter as ancillary data, but only via
+recvmsg(); the receive engines use recvfrom()/recvfrom_into(), so polling
+/proc from the once-a-second maintenance is the cheaper option.
+"""
+
+import os
+import sys
+
+_PROC_FILES = ('/proc/net/udp', '/proc/net/udp6')
+
+
+def udp_socket_stats(sock):
+    """(kernel drops, receive queue bytes) for a UDP socket, or None if unavailable"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+    except (OSError, ValueError):
+        return None
+
+    for path in _PROC_FILES:
+        try:
+            with open(path) as f:
+                next(f)  # Header
+                for line in f:
+                    fields = line.split()
+                    # sl local rem st tx_queue:rx_queue tr:tm retrnsmt uid timeout inode ref pointer drops
+                    if len(fields) >= 13 and fields[9] == inode:
+                        rx_queue = int(fields[4].split(':')[1], 16)
+                        return int(fields[12]), rx_queue
+        except OSError:
+            continue
+    return None
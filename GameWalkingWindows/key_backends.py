@@ -0,0 +1,258 @@
+"""
+Key injection backends used by KeySender
+
+    pyautogui  - portable, the original implementation (needs a display)
+    sendinput  - Windows SendInput with hardware scan codes, no per-call pause
+    uinput     - Linux virtual keyboard through python-evdev, works headless
+    recording  - in-memory, records timestamped key events (tests, benchmarks)
+
+Backends only know how to press and release a key; timing, locking and
+fail-safe handling stay in KeySender.
+"""
+
+import collections
+import logging
+import sys
+import time
+
+log = logging.getLogger('gamewalking.keys')
+
+BACKENDS = ('auto', 'pyautogui', 'sendinput', 'uinput', 'recording')
+
+
+class KeyBackendError(Exception):
+    """The requested key backend could not be loaded"""
+
+
+class FailSafeTriggered(Exception):
+    """The backend's emergency stop fired (e.g. PyAutoGUI mouse-in-corner)"""
+
+
+class KeyBackend:
+    """Interface for key injection backends"""
+    name = 'base'
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend(KeyBackend):
+    name = 'pyautogui'
+
+    def __init__(self, pause=0.01):
+        import pyautogui
+        self.pyautogui = pyautogui
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = pause  # Pause after every call
+
+    def key_down(self, key):
+        try:
+            self.pyautogui.keyDown(key)
+        except self.pyautogui.FailSafeException as e:
+            raise FailSafeTriggered(str(e))
+
+    def key_up(self, key):
+        try:
+            self.pyautogui.keyUp(key)
+        except self.pyautogui.FailSafeException as e:
+            raise FailSafeTriggered(str(e))
+
+
+class RecordingBackend(KeyBackend):
+    """Records (perf_counter timestamp, 'down'/'up', key) instead of pressing keys"""
+    name = 'recording'
+
+    def __init__(self, max_events=100000):
+        self.events = collections.deque(maxlen=max_events)
+        self.held = set()
+
+    def key_down(self, key):
+        self.events.append((time.perf_counter(), 'down', key))
+        self.held.add(key)
+
+    def key_up(self, key):
+        self.events.append((time.perf_counter(), 'up', key))
+        self.held.discard(key)
+
+    def presses(self, key=None):
+        """Number of recorded key-down events, optionally for one key"""
+        return sum(1 for _, action, k in self.events if action == 'down' and (key is None or k == key))
+
+    def clear(self):
+        self.events.clear()
+        self.held.clear()
+
+
+# Windows virtual-key codes for PyAutoGUI key names, letters and digits map to ord()
+_WINDOWS_VK = {
+    'space': 0x20, 'enter': 0x0D, 'return': 0x0D, 'tab': 0x09, 'esc': 0x1B, 'escape': 0x1B,
+    'backspace': 0x08, 'shift': 0xA0, 'shiftleft': 0xA0, 'shiftright': 0xA1,
+    'ctrl': 0xA2, 'ctrlleft': 0xA2, 'ctrlright': 0xA3, 'alt': 0xA4, 'altleft': 0xA4, 'altright': 0xA5,
+    'left': 0x25, 'up': 0x26, 'right': 0x27, 'down': 0x28,
+    'pageup': 0x21, 'pagedown': 0x22, 'end': 0x23, 'home': 0x24, 'insert': 0x2D, 'delete': 0x2E
+}
+_WINDOWS_VK.update({f'f{n}': 0x6F + n for n in range(1, 13)})
+_WINDOWS_EXTENDED = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E, 0xA3, 0xA5}
+
+
+class SendInputBackend(KeyBackend):
+    """Windows SendInput with scan codes, which DirectInput games also see"""
+    name = 'sendinput'
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("SendInput backend is only available on Windows")
+
+        import ctypes
+        from ctypes import wintypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [('wVk', wintypes.WORD), ('wScan', wintypes.WORD), ('dwFlags', wintypes.DWORD),
+                        ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [('dx', wintypes.LONG), ('dy', wintypes.LONG), ('mouseData', wintypes.DWORD),
+                        ('dwFlags', wintypes.DWORD), ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class INPUTUNION(ctypes.Union):
+            _fields_ = [('ki', KEYBDINPUT), ('mi', MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [('type', wintypes.DWORD), ('u', INPUTUNION)]
+
+        self.ctypes = ctypes
+        self.INPUT = INPUT
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        # Prebuilt INPUT structures per (key, up) so each call is a single SendInput
+        self._inputs = {}
+
+    def _input_for(self, key, up):
+        cached = self._inputs.get((key, up))
+        if cached is not None:
+            return cached
+
+        name = key.lower()
+        if len(name) == 1 and name.isalnum():
+            vk = ord(name.upper())
+        elif name in _WINDOWS_VK:
+            vk = _WINDOWS_VK[name]
+        else:
+            raise ValueError(f"Unsupported key for SendInput: {key}")
+
+        flags = 0x0008  # KEYEVENTF_SCANCODE
+        if vk in _WINDOWS_EXTENDED:
+            flags |= 0x0001  # KEYEVENTF_EXTENDEDKEY
+        if up:
+            flags |= 0x0002  # KEYEVENTF_KEYUP
+
+        event = self.INPUT()
+        event.type = 1  # INPUT_KEYBOARD
+        event.u.ki.wVk = 0
+        event.u.ki.wScan = self.user32.MapVirtualKeyW(vk, 0)
+        event.u.ki.dwFlags = flags
+        cached = (event, self.ctypes.sizeof(event))
+        self._inputs[(key, up)] = cached
+        return cached
+
+    def _send(self, key, up):
+        event, size = self._input_for(key, up)
+        if self.user32.SendInput(1, self.ctypes.byref(event), size) != 1:
+            raise OSError(f"SendInput failed: {self.ctypes.get_last_error()}")
+
+    def key_down(self, key):
+        self._send(key, False)
+
+    def key_up(self, key):
+        self._send(key, True)
+
+
+# evdev key names for PyAutoGUI key names, letters and digits map to KEY_<upper>
+_EVDEV_KEYS = {
+    'space': 'KEY_SPACE', 'enter': 'KEY_ENTER', 'return': 'KEY_ENTER', 'tab': 'KEY_TAB',
+    'esc': 'KEY_ESC', 'escape': 'KEY_ESC', 'backspace': 'KEY_BACKSPACE',
+    'shift': 'KEY_LEFTSHIFT', 'shiftleft': 'KEY_LEFTSHIFT', 'shiftright': 'KEY_RIGHTSHIFT',
+    'ctrl': 'KEY_LEFTCTRL', 'ctrlleft': 'KEY_LEFTCTRL', 'ctrlright': 'KEY_RIGHTCTRL',
+    'alt': 'KEY_LEFTALT', 'altleft': 'KEY_LEFTALT', 'altright': 'KEY_RIGHTALT',
+    'left': 'KEY_LEFT', 'up': 'KEY_UP', 'right': 'KEY_RIGHT', 'down': 'KEY_DOWN',
+    'pageup': 'KEY_PAGEUP', 'pagedown': 'KEY_PAGEDOWN', 'end': 'KEY_END', 'home': 'KEY_HOME',
+    'insert': 'KEY_INSERT', 'delete': 'KEY_DELETE'
+}
+_EVDEV_KEYS.update({f'f{n}': f'KEY_F{n}' for n in range(1, 13)})
+
+
+class UInputBackend(KeyBackend):
+    """Linux virtual keyboard via /dev/uinput, needs python-evdev and write access to uinput"""
+    name = 'uinput'
+
+    def __init__(self):
+        from evdev import UInput, ecodes
+        self.ecodes = ecodes
+
+        names = set(_EVDEV_KEYS.values())
+        names.update(f'KEY_{c}' for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+        self.codes = {name: ecodes.ecodes[name] for name in names}
+        self.device = UInput({ecodes.EV_KEY: sorted(self.codes.values())}, name='GameWalking')
+
+    def _code(self, key):
+        name = key.lower()
+        if len(name) == 1 and name.isalnum():
+            evdev_name = f'KEY_{name.upper()}'
+        else:
+            evdev_name = _EVDEV_KEYS.get(name)
+        if evdev_name not in self.codes:
+            raise ValueError(f"Unsupported key for uinput: {key}")
+        return self.codes[evdev_name]
+
+    def key_down(self, key):
+        self.device.write(self.ecodes.EV_KEY, self._code(key), 1)
+        self.device.syn()
+
+    def key_up(self, key):
+        self.device.write(self.ecodes.EV_KEY, self._code(key), 0)
+        self.device.syn()
+
+    def close(self):
+        self.device.close()
+
+
+def _load_backend(name, pyautogui_pause):
+    if name == 'pyautogui':
+        return PyAutoGUIBackend(pyautogui_pause)
+    if name == 'sendinput':
+        return SendInputBackend()
+    if name == 'uinput':
+        return UInputBackend()
+    if name == 'recording':
+        return RecordingBackend()
+    raise KeyBackendError(f"Unknown key backend '{name}'")
+
+
+def create_backend(name, pyautogui_pause=0.01):
+    """Create a backend by name
+
+    A named backend that cannot be loaded raises KeyBackendError rather than
+    leaving the app running without pressing keys. Only 'auto' falls back,
+    from the platform's native backend to PyAutoGUI and finally to recording.
+    """
+    if name != 'auto':
+        try:
+            return _load_backend(name, pyautogui_pause)
+        except KeyBackendError:
+            raise
+        except Exception as e:
+            raise KeyBackendError(f"Key backend '{name}' unavailable: {e}") from e
+
+    for candidate in ('sendinput' if sys.platform == 'win32' else 'uinput', 'pyautogui'):
+        try:
+            return _load_backend(candidate, pyautogui_pause)
+        except Exception as e:
+            log.warning("Key backend '%s' unavailable: %s", candidate, e)
+
+    log.error("No key backend available - key presses will only be recorded")
+    return RecordingBackend()
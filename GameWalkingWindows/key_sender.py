@@ -1,100 +1,190 @@
-import pyautogui
+import logging
 import time
 import threading
-from config import Config
+from config import get_config
+from key_backends import KeyBackend, FailSafeTriggered, create_backend
+import spans
+
+log = logging.getLogger('gamewalking.keys')
 
 class KeySender:
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, backend=None):
+        self.config = get_config()
         self.is_active = False
+        self.held_keys = set()
         self.lock = threading.Lock()
         
-        # Configure pyautogui
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.01  # Minimal pause between actions
+        # Key injection backend: an instance, a backend name, or the configured one
+        if not isinstance(backend, KeyBackend):
+            backend = create_backend(
+                backend or self.config.get('CONTROLS', 'key_backend', 'pyautogui'),
+                self.config.getfloat('CONTROLS', 'pyautogui_pause', 0.01)
+            )
+        self.backend = backend
+        log.info("Using key backend: %s", self.backend.name)
         
-        # Get configuration
+        # Get configuration, and follow later changes from anywhere in the app
+        self.load_settings()
+        self.config.subscribe(self._on_config_change)
+    
+    def load_settings(self):
+        """Read key settings from the shared configuration"""
         self.forward_key = self.config.get('CONTROLS', 'forward_key', 'w')
         self.step_duration = self.config.getfloat('CONTROLS', 'step_duration', 0.1)
         self.key_hold_duration = self.config.getfloat('CONTROLS', 'key_hold_duration', 0.05)
+        self.release_gap = self.config.getfloat('CONTROLS', 'release_gap', 0.01)
         
         self.debug_mode = self.config.getboolean('GENERAL', 'debug_mode', False)
+    
+    def _on_config_change(self, section, key, value):
+        if section in ('CONTROLS', 'GENERAL'):
+            self.load_settings()
         
-    def send_step(self):
-        """Send a step command (forward movement)"""
+    def send_step(self, key=None):
+        """Send a step command (forward movement), optionally on a per-player key"""
         if not self.is_active:
             return
-            
+        
+        key = key or self.forward_key
+        tracer = spans.TRACER
+        if tracer is not None:
+            start = time.perf_counter()
         with self.lock:
             try:
+                if tracer is not None:
+                    tracer.record('key_lock_wait', start)
                 if self.debug_mode:
-                    print(f"Sending key: {self.forward_key}")
+                    log.debug("Sending key: %s", key, extra={'event': 'key'})
                 
                 # Press and hold the key briefly
-                pyautogui.keyDown(self.forward_key)
+                if tracer is not None:
+                    start = time.perf_counter()
+                self.backend.key_down(key)
+                if tracer is not None:
+                    tracer.record('key_down', start)
                 time.sleep(self.key_hold_duration)
-                pyautogui.keyUp(self.forward_key)
+                if tracer is not None:
+                    start = time.perf_counter()
+                self.backend.key_up(key)
+                if tracer is not None:
+                    tracer.record('key_up', start)
                 
                 # Small delay to prevent spam
-                time.sleep(0.01)
+                if self.release_gap:
+                    time.sleep(self.release_gap)
                 
-            except pyautogui.FailSafeException:
-                print("PyAutoGUI FailSafe triggered - mouse moved to corner")
+            except FailSafeTriggered:
+                log.warning("FailSafe triggered - mouse moved to corner")
                 self.is_active = False
             except Exception as e:
-                print(f"Error sending key: {e}")
+                log.error("Error sending key: %s", e)
     
-    def send_continuous_forward(self, duration):
+    def send_continuous_forward(self, duration, key=None):
         """Send continuous forward movement for specified duration"""
         if not self.is_active:
             return
-            
+        
+        key = key or self.forward_key
         try:
             if self.debug_mode:
-                print(f"Continuous forward for {duration} seconds")
+                log.debug("Continuous forward for %s seconds", duration)
             
-            pyautogui.keyDown(self.forward_key)
+            self.backend.key_down(key)
             time.sleep(duration)
-            pyautogui.keyUp(self.forward_key)
+            self.backend.key_up(key)
             
-        except pyautogui.FailSafeException:
-            print("PyAutoGUI FailSafe triggered")
+        except FailSafeTriggered:
+            log.warning("FailSafe triggered")
             self.is_active = False
-            pyautogui.keyUp(self.forward_key)  # Ensure key is released
+            self.backend.key_up(key)  # Ensure key is released
         except Exception as e:
-            print(f"Error in continuous forward: {e}")
-            pyautogui.keyUp(self.forward_key)  # Ensure key is released
+            log.error("Error in continuous forward: %s", e)
+            self.backend.key_up(key)  # Ensure key is released
+    
+    def is_holding(self, key=None):
+        """Whether the given (or default) forward key is currently held down"""
+        return (key or self.forward_key) in self.held_keys
+    
+    def hold_forward(self, key=None):
+        """Press the forward key and keep it down until release_forward()"""
+        if not self.is_active:
+            return
+        
+        key = key or self.forward_key
+        tracer = spans.TRACER
+        if tracer is not None:
+            start = time.perf_counter()
+        with self.lock:
+            if tracer is not None:
+                tracer.record('key_lock_wait', start)
+            if key in self.held_keys:
+                return
+            try:
+                if tracer is not None:
+                    start = time.perf_counter()
+                self.backend.key_down(key)
+                if tracer is not None:
+                    tracer.record('key_down', start)
+                self.held_keys.add(key)
+            except FailSafeTriggered:
+                log.warning("FailSafe triggered")
+                self.is_active = False
+                self.backend.key_up(key)
+            except Exception as e:
+                log.error("Error holding forward key: %s", e)
+    
+    def release_forward(self, key=None):
+        """Release the forward key if it is being held"""
+        key = key or self.forward_key
+        tracer = spans.TRACER
+        if tracer is not None:
+            start = time.perf_counter()
+        with self.lock:
+            if tracer is not None:
+                tracer.record('key_lock_wait', start)
+            if key not in self.held_keys:
+                return
+            self.held_keys.discard(key)
+            try:
+                if tracer is not None:
+                    start = time.perf_counter()
+                self.backend.key_up(key)
+                if tracer is not None:
+                    tracer.record('key_up', start)
+            except Exception as e:
+                log.error("Error releasing forward key: %s", e)
     
     def activate(self):
         """Activate key sending"""
         self.is_active = True
-        print("Key sender activated")
+        log.info("Key sender activated")
     
     def deactivate(self):
         """Deactivate key sending"""
         self.is_active = False
         # Release any held keys
-        try:
-            pyautogui.keyUp(self.forward_key)
-        except:
-            pass
-        print("Key sender deactivated")
+        with self.lock:
+            keys = self.held_keys | {self.forward_key}
+            self.held_keys.clear()
+        for key in keys:
+            try:
+                self.backend.key_up(key)
+            except:
+                pass
+        log.info("Key sender deactivated")
     
     def update_settings(self, forward_key=None, step_duration=None, key_hold_duration=None):
-        """Update key sender settings"""
+        """Update key sender settings (applied through the config subscription)"""
         if forward_key:
-            self.forward_key = forward_key
             self.config.set('CONTROLS', 'forward_key', forward_key)
         
         if step_duration:
-            self.step_duration = step_duration
             self.config.set('CONTROLS', 'step_duration', str(step_duration))
         
         if key_hold_duration:
-            self.key_hold_duration = key_hold_duration
             self.config.set('CONTROLS', 'key_hold_duration', str(key_hold_duration))
     
     def test_key(self):
         """Test key sending functionality"""
-        print(f"Testing key: {self.forward_key}")
+        log.info("Testing key: %s", self.forward_key)
         self.send_step()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import bisect
+import threading
+
+# Bucket upper bounds in seconds: 50 us to ~30 s, growing by 25% per bucket
+BUCKET_BOUNDS = []
+_bound = 0.00005
+while _bound < 30.0:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.25
+del _bound
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in seconds, constant memory"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Add one observation"""
+        if seconds < 0:
+            seconds = 0.0
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (0-100)"""
+        if self.count == 0:
+            return 0.0
+
+        rank = self.count * p / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if i < len(BUCKET_BOUNDS):
+                    return min(BUCKET_BOUNDS[i], self.max)
+                return self.max
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def summary(self):
+        """p50/p95/p99/max in milliseconds"""
+        return {
+            'count': self.count,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000
+        }
+
+
+class ClockOffsetEstimator:
+    """Estimate the offset between a sender's monotonic clock and ours
+
+    One-way packets cannot separate clock offset from network delay, so the
+    estimate is the smallest observed (receive - send) difference, i.e. the
+    offset plus the best-case transit time. Transit values derived from it
+    are the delay above that best case. The minimum is tracked over two
+    alternating windows so the estimate follows clock drift.
+    """
+    __slots__ = ('window', 'offset', 'current_min', 'previous_min', 'window_start')
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.offset = None
+        self.current_min = None
+        self.previous_min = None
+        self.window_start = None
+
+    def update(self, sender_time, receive_time):
+        """Feed a (sender, receiver) timestamp pair, return the transit estimate"""
+        difference = receive_time - sender_time
+
+        if self.window_start is None or receive_time - self.window_start > self.window:
+            self.previous_min = self.current_min
+            self.current_min = None
+            self.window_start = receive_time
+
+        if self.current_min is None or difference < self.current_min:
+            self.current_min = difference
+
+        if self.previous_min is None:
+            self.offset = self.current_min
+        else:
+            self.offset = min(self.current_min, self.previous_min)
+
+        return difference - self.offset
+
+
+class LatencyStats:
+    """Per-stage latency histograms for the step pipeline"""
+
+    STAGES = ('network', 'queue', 'injection', 'total')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].record(seconds)
+
+    def reset(self):
+        with self.lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+    def summary(self):
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def snapshot(self):
+        """Copies of each stage's (bucket counts, count, total seconds)"""
+        with self.lock:
+            return {stage: (list(histogram.counts), histogram.count, histogram.total)
+                    for stage, histogram in self.histograms.items()}
@@ -0,0 +1,212 @@
+"""
+Non-blocking logging for the receive and injection threads
+
+Modules log through loggers under 'gamewalking' (gamewalking.listener,
+gamewalking.keys, gamewalking.injector, gamewalking.movement,
+gamewalking.config, gamewalking.metrics, gamewalking.spans). setup_logging() gives that tree a
+single QueueHandler: the calling thread only runs the filters and puts the
+unformatted record on a bounded queue, and a QueueListener thread does the
+formatting and the console/file I/O. When the queue is full the record is
+dropped and counted instead of blocking the hot path.
+
+Per-event messages (one per packet, step or key press) pass
+extra={'event': name}. EventFilter keeps only every Nth of each event
+(sample_every) and at most rate_limit per second of each, and notes how many
+were suppressed on the next one that gets through.
+
+Settings live in the [LOGGING] section:
+
+    format          text or json (one JSON object per line)
+    file            rotating log file, empty for console only
+    file_max_bytes  rotate after this many bytes
+    file_backups    rotated files to keep
+    sample_every    log every Nth per-event message
+    rate_limit      per-event messages per second, 0 = unlimited
+    queue_size      records waiting for the logging thread
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+LOGGER_NAME = 'gamewalking'
+
+_listener = None
+_handler = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener thread"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The default prepare() formats the message on the calling thread;
+        # records only cross threads here, so pass them through as they are
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventFilter(logging.Filter):
+    """Sample and rate-limit records tagged with an `event` attribute"""
+
+    def __init__(self, sample_every=1, rate_limit=0):
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        # event -> [seen, window start, passed in window, suppressed]
+        self.events = {}
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            state = self.events.get(event)
+            if state is None:
+                state = self.events[event] = [0, now, 0, 0]
+            state[0] += 1
+            if state[0] % self.sample_every:
+                state[3] += 1
+                return False
+            if self.rate_limit:
+                if now - state[1] >= 1.0:
+                    state[1] = now
+                    state[2] = 0
+                if state[2] >= self.rate_limit:
+                    state[3] += 1
+                    return False
+                state[2] += 1
+            record.suppressed = state[3]
+            state[3] = 0
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """Plain messages on the console, like the print() output they replace"""
+
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            message += f" ({suppressed} similar suppressed)"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        event = getattr(record, 'event', None)
+        if event is not None:
+            entry['event'] = event
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def setup_logging(config, log_file=None, log_format=None):
+    """Route the gamewalking loggers through a queue to console and file sinks"""
+    global _listener, _handler
+    if _listener is not None:
+        return _handler
+
+    log_format = log_format or config.get('LOGGING', 'format', 'text')
+    log_file = log_file or config.get('LOGGING', 'file', '')
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        if log_format != 'text':
+            print(f"Unknown log format '{log_format}', using text")
+        formatter = TextFormatter('%(message)s')
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatter)
+    handlers = [console]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=config.getint('LOGGING', 'file_max_bytes', 1048576),
+            backupCount=config.getint('LOGGING', 'file_backups', 3),
+            encoding='utf-8'
+        )
+        if log_format == 'json':
+            file_handler.setFormatter(formatter)
+        else:
+            file_handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        handlers.append(file_handler)
+
+    _handler = DroppingQueueHandler(queue.Queue(config.getint('LOGGING', 'queue_size', 10000)))
+    _handler.addFilter(EventFilter(config.getint('LOGGING', 'sample_every', 1),
+                                   config.getfloat('LOGGING', 'rate_limit', 20)))
+
+    # Hot paths check debug_mode before logging per-packet messages, so the
+    # logger itself lets everything through
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _handler
+
+
+def shutdown_logging():
+    """Flush pending records and stop the logging thread"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.removeHandler(_handler)
+    logger.propagate = True
+    if _handler.dropped:
+        print(f"{_handler.dropped} log messages dropped, logging queue was full")
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _handler = None
+
+
+def setup_worker_logging():
+    """Logging for a listener worker process: warnings and errors straight to stderr
+
+    A forked worker inherits the parent's QueueHandler but not its logging
+    thread, so the handler is replaced rather than left to fill up.
+    """
+    global _listener, _handler
+    _listener = None
+    _handler = None
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setLevel(logging.WARNING)
+    stream.setFormatter(TextFormatter('%(processName)s: %(message)s'))
+    logger.addHandler(stream)
+    logger.propagate = False
@@ -7,10 +7,14 @@ Receives UDP signals from Android app and converts to keyboard input for games
 import sys
 import os
 import argparse
-from config import Config
+from config import get_config
+from log_setup import setup_logging, shutdown_logging
 from key_sender import KeySender
+from key_backends import BACKENDS, KeyBackendError
 from udp_listener import UDPListener
-from gui import GameWalkingGUI
+
+# GUI, tray and key injection libraries are imported only when used, so
+# --no-gui starts quickly and works on machines without a display
 
 def setup_firewall_message():
     """Display firewall setup message"""
@@ -30,60 +34,207 @@ def setup_firewall_message():
     print("=" * 60)
     print()
 
+def print_import_profile(argv, top=15):
+    """Re-run startup under -X importtime and print the slowest imports"""
+    if getattr(sys, 'frozen', False):
+        print("--import-profile is only available when running from source")
+        return
+    
+    import subprocess
+    command = [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--exit-after-init'] + argv
+    result = subprocess.run(command, capture_output=True, text=True)
+    
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us), int(self_us), name.strip()))
+    
+    imports.sort(reverse=True)
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, name in imports[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+def start_metrics(udp_listener, config, port=None):
+    """Start the Prometheus endpoint if a metrics port is configured"""
+    if port is None:
+        port = config.getint('NETWORK', 'metrics_port', 0)
+    if not port:
+        return None
+    
+    from metrics import MetricsServer
+    server = MetricsServer(udp_listener, port, config.get('NETWORK', 'metrics_host', '127.0.0.1'))
+    if not server.start():
+        return None
+    return server
+
+def start_instrumentation(args):
+    """Enable spans and the profile window as requested, returns (trace hook, profile window)"""
+    if args.profile is None and not args.trace and not args.slow_spans:
+        return None, None
+    
+    import spans
+    tracer = spans.enable()
+    trace_hook = None
+    if args.trace:
+        trace_hook = spans.TraceFileHook(args.trace)
+        tracer.subscribe(trace_hook)
+        print(f"Writing spans to {args.trace}")
+    if args.slow_spans:
+        tracer.subscribe(spans.ConsoleHook(args.slow_spans))
+    
+    window = None
+    if args.profile is not None:
+        from profiling import ProfileWindow
+        window = ProfileWindow(args.profile)
+        window.start()
+    return trace_hook, window
+
+def stop_instrumentation(trace_hook, window):
+    if window:
+        window.finish()
+    if trace_hook:
+        trace_hook.close()
+
 def main():
     parser = argparse.ArgumentParser(description='GameWalking Desktop Application')
     parser.add_argument('--no-gui', action='store_true', help='Run without GUI (console mode)')
     parser.add_argument('--port', type=int, default=9000, help='UDP port to listen on')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread',
+                        help='Listener engine for console mode (default: thread)')
+    parser.add_argument('--key-backend', choices=BACKENDS,
+                        help='Key injection backend (default: key_backend from config)')
+    parser.add_argument('--workers', type=int,
+                        help='Receive in N processes sharing the port (default: workers from config, 0 = in-process)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on this local port (default: metrics_port from config, 0 = off)')
+    parser.add_argument('--capture', metavar='FILE',
+                        help='Append every received datagram to FILE for replay.py')
+    parser.add_argument('--history', metavar='FILE',
+                        help='Record every step per device to FILE (default: file from [HISTORY])')
+    parser.add_argument('--log-file', metavar='FILE',
+                        help='Also log to a rotating FILE (default: file from [LOGGING])')
+    parser.add_argument('--log-format', choices=['text', 'json'],
+                        help='Log as plain text or JSON lines (default: format from [LOGGING])')
+    parser.add_argument('--profile', type=float, nargs='?', const=30.0, metavar='SECONDS',
+                        help='Record spans, cProfile and tracemalloc for SECONDS (default 30), then print a report')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write hot-path spans to FILE as Chrome trace events')
+    parser.add_argument('--slow-spans', type=float, metavar='MS',
+                        help='Print every hot-path span that takes longer than MS milliseconds')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='Report the slowest imports during startup and exit')
+    parser.add_argument('--exit-after-init', action='store_true', help=argparse.SUPPRESS)
     
     args = parser.parse_args()
     
+    if args.import_profile:
+        print_import_profile([arg for arg in sys.argv[1:] if arg != '--import-profile'])
+        return
+    
     # Show firewall message
-    setup_firewall_message()
+    if not args.exit_after_init:
+        setup_firewall_message()
     
     # Initialize components
-    config = Config()
+    config = get_config()
     if args.debug:
-        config.set('GENERAL', 'debug_mode', 'true')
+        # Shared by every component, but not saved to the config file
+        config.set('GENERAL', 'debug_mode', 'true', persist=False)
+    
+    # Console and file output happen on a logging thread, not in the hot paths
+    setup_logging(config, args.log_file, args.log_format)
     
-    key_sender = KeySender()
+    try:
+        key_sender = KeySender(args.key_backend)
+    except KeyBackendError as e:
+        print(f"Error: {e}")
+        print("Install it, or choose another backend with --key-backend or key_backend in the config")
+        sys.exit(1)
+    
+    workers = args.workers if args.workers is not None else config.getint('NETWORK', 'workers', 0)
+    if workers and args.capture:
+        print("--capture is not supported with listener workers, ignoring it")
+        args.capture = None
+    history = args.history or config.get('HISTORY', 'file', '')
+    if workers and history:
+        print("Step history files are not supported with listener workers, ignoring it")
+        history = None
     
     if args.no_gui:
         # Console mode
-        udp_listener = UDPListener(key_sender)
+        if workers:
+            from sharded import ShardedUDPListener
+            udp_listener = ShardedUDPListener(key_sender, workers)
+        elif args.engine == 'asyncio':
+            from async_listener import AsyncUDPListener
+            udp_listener = AsyncUDPListener(key_sender)
+        else:
+            udp_listener = UDPListener(key_sender)
         if args.port != 9000:
             udp_listener.update_port(args.port)
         
+        if args.exit_after_init:
+            return
+        
         print(f"Starting GameWalking in console mode on port {udp_listener.port}")
         print("Press Ctrl+C to stop")
         
+        metrics_server = start_metrics(udp_listener, config, args.metrics_port)
+        if args.capture:
+            udp_listener.start_capture(args.capture)
+        if history:
+            udp_listener.start_history(history)
+        trace_hook, profile_window = start_instrumentation(args)
+        
         try:
             key_sender.activate()
             udp_listener.start_listening()
             
             # Keep running
-            while True:
+            if args.engine == 'asyncio' and not workers:
+                udp_listener.run_forever()
+            else:
                 import time
-                time.sleep(1)
+                while True:
+                    time.sleep(1)
                 
         except KeyboardInterrupt:
             print("\nShutting down...")
-            udp_listener.stop_listening()
+            if udp_listener.is_listening:
+                udp_listener.stop_listening()
+            udp_listener.stop_capture()
+            udp_listener.stop_history()
             key_sender.deactivate()
+            if metrics_server:
+                metrics_server.stop()
+            stop_instrumentation(trace_hook, profile_window)
     else:
         # GUI mode
-        def gui_status_callback(status_info):
-            # This will be called by UDP listener to update GUI
-            pass
+        from gui import GameWalkingGUI
         
-        udp_listener = UDPListener(key_sender, gui_status_callback)
+        if workers:
+            from sharded import ShardedUDPListener
+            udp_listener = ShardedUDPListener(key_sender, workers)
+        else:
+            udp_listener = UDPListener(key_sender)
         if args.port != 9000:
             udp_listener.update_port(args.port)
         
+        if args.exit_after_init:
+            return
+        
+        metrics_server = start_metrics(udp_listener, config, args.metrics_port)
+        if args.capture:
+            udp_listener.start_capture(args.capture)
+        if history:
+            udp_listener.start_history(history)
+        trace_hook, profile_window = start_instrumentation(args)
+        
         # Create and run GUI
         app = GameWalkingGUI(udp_listener, key_sender, config)
-        # Update callback to point to GUI
-        udp_listener.gui_callback = app.update_status
         
         try:
             app.run()
@@ -95,7 +246,19 @@ def main():
             # Cleanup
             if udp_listener.is_listening:
                 udp_listener.stop_listening()
+            udp_listener.stop_capture()
+            udp_listener.stop_history()
             key_sender.deactivate()
+            if metrics_server:
+                metrics_server.stop()
+            stop_instrumentation(trace_hook, profile_window)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if getattr(sys, 'frozen', False):
+        # Listener worker processes re-enter the executable
+        import multiprocessing
+        multiprocessing.freeze_support()
+    try:
+        main()
+    finally:
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Prometheus metrics endpoint
+
+Serves the listener and injector counters at http://<host>:<port>/metrics in
+the Prometheus text exposition format. The server runs on its own daemon
+thread and only reads counters the receive and injector threads already
+maintain, so a scrape never blocks packet handling. Enable it with
+metrics_port in the [NETWORK] section or --metrics-port.
+"""
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import spans
+from latency import BUCKET_BOUNDS
+
+log = logging.getLogger('gamewalking.metrics')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (name, type, help, get_status() key)
+LISTENER_METRICS = (
+    ('gamewalking_packets_received_total', 'counter', 'Datagrams received', 'packets_received'),
+    ('gamewalking_steps_received_total', 'counter', 'Steps accepted from phones', 'steps_received'),
+    ('gamewalking_steps_injected_total', 'counter', 'Steps dispatched to the movement engine', 'steps_injected'),
+    ('gamewalking_parse_errors_total', 'counter', 'Datagrams that could not be decoded', 'parse_errors'),
+    ('gamewalking_socket_errors_total', 'counter', 'Socket errors while receiving', 'socket_errors'),
+    ('gamewalking_kernel_drops_total', 'counter', 'Datagrams dropped by the kernel, receive buffer full', 'kernel_drops'),
+    ('gamewalking_packets_shed_total', 'counter', 'Datagrams discarded by load shedding', 'packets_shed'),
+    ('gamewalking_receive_backlog_bytes', 'gauge', 'Bytes waiting in the socket receive buffer', 'receive_backlog_bytes'),
+    ('gamewalking_packets_lost', 'gauge', 'Packets missing from a sequence and not recovered', 'packets_lost'),
+    ('gamewalking_packets_out_of_order_total', 'counter', 'Packets that arrived late', 'packets_out_of_order'),
+    ('gamewalking_packets_duplicate_total', 'counter', 'Duplicate packets dropped', 'packets_duplicate'),
+    ('gamewalking_packets_recovered_total', 'counter', 'Lost packets recovered from redundant copies', 'packets_recovered'),
+    ('gamewalking_steps_stale_total', 'counter', 'Steps dropped for arriving too late', 'steps_stale'),
+    ('gamewalking_queue_depth', 'gauge', 'Steps waiting for the injector', 'queue_depth'),
+    ('gamewalking_queue_max_depth', 'gauge', 'Highest queue depth seen', 'queue_max_depth'),
+    ('gamewalking_queue_dropped_total', 'counter', 'Steps dropped by the queue overflow policy', 'queue_dropped'),
+    ('gamewalking_queue_coalesced_total', 'counter', 'Steps merged by the queue overflow policy', 'queue_coalesced'),
+    ('gamewalking_steps_shaped_total', 'counter', 'Steps delayed by per-device pacing', 'steps_shaped'),
+    ('gamewalking_steps_shaper_dropped_total', 'counter', 'Steps dropped by per-device pacing', 'steps_dropped_by_shaper'),
+    ('gamewalking_pings_answered_total', 'counter', 'Link probe pings answered', 'pings_answered'),
+    ('gamewalking_active_devices', 'gauge', 'Phones with a live session', 'active_devices'),
+    ('gamewalking_sessions_evicted_total', 'counter', 'Idle sessions evicted', 'sessions_evicted'),
+)
+
+DEVICE_METRICS = (
+    ('gamewalking_device_steps_total', 'counter', 'Steps accepted per phone', 'steps'),
+    ('gamewalking_device_packets_total', 'counter', 'Datagrams received per phone', 'packets'),
+    ('gamewalking_device_cadence', 'gauge', 'Walking cadence per phone in steps per second', 'cadence'),
+    ('gamewalking_device_idle_seconds', 'gauge', 'Seconds since the last packet per phone', 'idle'),
+)
+
+LATENCY_METRIC = 'gamewalking_step_latency_seconds'
+SPAN_METRIC = 'gamewalking_span_seconds'
+
+# Prometheus le labels, formatted once
+_BUCKET_LABELS = [f'{bound:.6g}' for bound in BUCKET_BOUNDS] + ['+Inf']
+
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_histograms(lines, name, label, snapshot):
+    """Append one labelled histogram series per entry of a histogram snapshot"""
+    for value, (counts, count, total) in snapshot.items():
+        cumulative = 0
+        for bound, bucket_count in zip(_BUCKET_LABELS, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {total}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+
+
+def render_metrics(listener):
+    """Current listener metrics in Prometheus text format"""
+    status = listener.get_status()
+    lines = []
+
+    for name, kind, help_text, key in LISTENER_METRICS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        value = status.get(key)
+        if value is not None:
+            # None means unknown here (e.g. kernel drops without /proc/net/udp), not 0
+            lines.append(f'{name} {value}')
+
+    lines.append(f'# HELP {LATENCY_METRIC} Time spent per step pipeline stage')
+    lines.append(f'# TYPE {LATENCY_METRIC} histogram')
+    _render_histograms(lines, LATENCY_METRIC, 'stage', listener.latency.snapshot())
+
+    tracer = spans.TRACER
+    if tracer is not None:
+        lines.append(f'# HELP {SPAN_METRIC} Time spent in instrumented hot-path spans')
+        lines.append(f'# TYPE {SPAN_METRIC} histogram')
+        _render_histograms(lines, SPAN_METRIC, 'span', tracer.snapshot())
+
+    sessions = status.get('sessions', [])
+    for name, kind, help_text, key in DEVICE_METRICS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for session in sessions:
+            lines.append(f'{name}{{device="{_escape(session["device"])}",'
+                         f'key="{_escape(session["forward_key"])}"}} {session[key]}')
+
+    lines.append('')
+    return '\n'.join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = render_metrics(self.server.listener).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+class MetricsServer:
+    """HTTP server for /metrics on a background thread"""
+
+    def __init__(self, listener, port, host='127.0.0.1'):
+        self.listener = listener
+        self.port = port
+        self.host = host
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Start serving, returns False if the port cannot be bound"""
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            log.error("Failed to start metrics endpoint: %s", e)
+            return False
+
+        self.server.daemon_threads = True
+        self.server.listener = self.listener
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        log.info("Metrics available at http://%s:%d/metrics", self.host, self.port)
+        return True
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger('gamewalking.movement')
+
+MOVEMENT_MODES = ('tap', 'continuous')
+
+
+class CadenceTracker:
+    """Exponentially weighted moving average of the interval between steps"""
+    __slots__ = ('alpha', 'max_gap', 'interval', 'last_step_time')
+
+    def __init__(self, alpha=0.3, max_gap=2.0):
+        self.alpha = alpha
+        self.max_gap = max_gap
+        self.interval = 0.0
+        self.last_step_time = 0.0
+
+    def update(self, timestamp):
+        """Record a step and return the smoothed step interval (0 if unknown)"""
+        gap = timestamp - self.last_step_time
+        if gap <= 0:
+            # Recovered earlier step arriving with or after a newer one - nothing new to learn
+            return self.interval
+        self.last_step_time = timestamp
+
+        if gap > self.max_gap:
+            # First step or walking resumed after a pause - start over
+            self.interval = 0.0
+        elif self.interval == 0.0:
+            self.interval = gap
+        else:
+            self.interval += self.alpha * (gap - self.interval)
+
+        return self.interval
+
+    def cadence(self):
+        """Current cadence in steps per second"""
+        if self.interval <= 0:
+            return 0.0
+        return 1.0 / self.interval
+
+    def reset(self):
+        """Forget all cadence history"""
+        self.interval = 0.0
+        self.last_step_time = 0.0
+
+
+class TapMovement:
+    """One key tap per step (original behaviour), at most max_taps per event
+
+    The cap keeps a coalesced event (or a large step counter catch-up) from
+    moving a burst from the queue into the injector loop; the surplus steps
+    are counted as taps_dropped.
+    """
+
+    def __init__(self, key_sender, max_taps=4):
+        self.key_sender = key_sender
+        self.max_taps = max_taps
+
+        # Statistics
+        self.taps_dropped = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def on_step(self, timestamp, count=1, key=None):
+        """Handle a step event"""
+        if self.max_taps and count > self.max_taps:
+            self.taps_dropped += count - self.max_taps
+            count = self.max_taps
+        for _ in range(count):
+            self.key_sender.send_step(key)
+
+    def get_stats(self):
+        return {'movement_mode': 'tap', 'taps_dropped': self.taps_dropped}
+
+
+class ContinuousMovement:
+    """Hold each player's forward key while their walking cadence is high enough"""
+
+    def __init__(self, key_sender, min_cadence=1.0, release_factor=1.5, alpha=0.3):
+        self.key_sender = key_sender
+        self.min_cadence = min_cadence
+        self.release_factor = release_factor
+        self.alpha = alpha
+
+        # Keyed by forward key (None is KeySender's default key)
+        self.trackers = {}
+        self.release_deadlines = {}
+
+        self.is_running = False
+        self.watchdog_thread = None
+        self._wakeup = threading.Condition()
+
+        # Statistics
+        self.holds_started = 0
+
+    def start(self):
+        """Start the release watchdog"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.trackers.clear()
+        self.watchdog_thread = threading.Thread(target=self._watchdog_loop, daemon=True)
+        self.watchdog_thread.start()
+
+    def stop(self):
+        """Stop the watchdog and release all keys"""
+        if not self.is_running:
+            return
+
+        with self._wakeup:
+            self.is_running = False
+            held = list(self.release_deadlines)
+            self.release_deadlines.clear()
+            self._wakeup.notify()
+
+        if self.watchdog_thread and self.watchdog_thread.is_alive():
+            self.watchdog_thread.join(timeout=2.0)
+
+        for key in held:
+            self.key_sender.release_forward(key)
+
+    def on_step(self, timestamp, count=1, key=None):
+        """Handle a step event"""
+        tracker = self.trackers.get(key)
+        if tracker is None:
+            tracker = self.trackers[key] = CadenceTracker(self.alpha)
+        interval = tracker.update(timestamp)
+
+        if tracker.cadence() < self.min_cadence:
+            # Not walking steadily yet - a short hold of step_duration per step
+            if not self.key_sender.is_holding(key):
+                self.key_sender.send_continuous_forward(self.key_sender.step_duration, key)
+            return
+
+        with self._wakeup:
+            if not self.key_sender.is_holding(key):
+                self.key_sender.hold_forward(key)
+                self.holds_started += 1
+
+            # Release once the next step is overdue
+            self.release_deadlines[key] = time.monotonic() + interval * self.release_factor
+            self._wakeup.notify()
+
+    def _watchdog_loop(self):
+        """Release forward keys when no step arrives in time"""
+        with self._wakeup:
+            while self.is_running:
+                if not self.release_deadlines:
+                    self._wakeup.wait()
+                    continue
+
+                now = time.monotonic()
+                expired = [key for key, deadline in self.release_deadlines.items() if deadline <= now]
+                for key in expired:
+                    del self.release_deadlines[key]
+                    self.key_sender.release_forward(key)
+
+                if self.release_deadlines:
+                    self._wakeup.wait(min(self.release_deadlines.values()) - now)
+
+    def get_stats(self):
+        return {
+            'movement_mode': 'continuous',
+            'cadence': max((t.cadence() for t in list(self.trackers.values())), default=0.0),
+            'holds_started': self.holds_started,
+            'keys_held': len(self.release_deadlines)
+        }
+
+
+def create_movement(key_sender, config):
+    """Build the movement engine selected in the configuration"""
+    mode = config.get('CONTROLS', 'movement_mode', 'tap')
+
+    if mode == 'continuous':
+        return ContinuousMovement(
+            key_sender,
+            config.getfloat('CONTROLS', 'min_cadence', 1.0),
+            config.getfloat('CONTROLS', 'release_factor', 1.5)
+        )
+    if mode != 'tap':
+        log.warning("Unknown movement mode '%s', using tap", mode)
+    return TapMovement(key_sender, config.getint('CONTROLS', 'max_taps', 4))
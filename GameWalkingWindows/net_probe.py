@@ -0,0 +1,197 @@
+"""
+Link quality probe
+
+A prober (test_network.py --probe, or another machine) sends timestamped
+PING datagrams at a fixed rate and the listener answers each with a PONG.
+run_probe() measures round-trip time percentiles, jitter, loss, reordering,
+duplicates and the offset between the two clocks. The listener keeps a
+LinkStats per probing source from the pings alone (one-way loss,
+reordering, interarrival jitter, plus the round-trip times the prober
+reports in each ping), so the GUI can show the link quality seen by the PC.
+"""
+
+import os
+import select
+import socket
+import time
+
+from latency import LatencyHistogram
+from protocol import build_ping, parse_pong, RTT_UNIT
+from sessions import SequenceWindow, SEQ_NEW, SEQ_LATE, SEQ_EARLY
+
+
+class LinkStats:
+    """Link quality of one probing source, updated per PING"""
+
+    def __init__(self, source):
+        self.source = source
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.jitter = 0.0
+        self.last_transit = None
+        self.last_seen = 0.0
+        self.window = SequenceWindow()
+        self.rtt = LatencyHistogram()
+
+    def update(self, sequence, sender_time, rtt_units, now):
+        """Account for a PING; sender_time in microseconds, now in seconds (monotonic)"""
+        self.last_seen = now
+        result = self.window.accept(sequence)
+        if result == SEQ_NEW:
+            self.lost += self.window.skipped
+        elif result == SEQ_LATE:
+            self.lost -= 1
+            self.reordered += 1
+        elif result == SEQ_EARLY:
+            self.reordered += 1
+        else:
+            self.duplicates += 1
+            return
+        self.received += 1
+
+        # RFC 3550 interarrival jitter; the clocks' offset cancels out
+        transit = now - sender_time / 1e6
+        if self.last_transit is not None:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16.0
+        self.last_transit = transit
+
+        if rtt_units:
+            self.rtt.record(rtt_units * RTT_UNIT)
+
+    def summary(self, now):
+        expected = self.received + self.lost
+        rtt = self.rtt.summary()
+        return {
+            'source': self.source,
+            'received': self.received,
+            'loss': self.lost / expected if expected else 0.0,
+            'reordered': self.reordered,
+            'duplicates': self.duplicates,
+            'jitter_ms': self.jitter * 1000,
+            'rtt_p50_ms': rtt['p50_ms'],
+            'rtt_p95_ms': rtt['p95_ms'],
+            'rtt_max_ms': rtt['max_ms'],
+            'age': now - self.last_seen
+        }
+
+
+def _percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+def run_probe(host, port=9000, rate=20.0, count=100, timeout=1.0, device_id=None):
+    """Probe a listener with `count` pings at `rate` per second and return the results
+
+    Pongs arriving more than `timeout` seconds after the last ping are
+    counted as lost. Times in the result are in milliseconds.
+    """
+    if device_id is None:
+        device_id = os.getpid() & 0xFFFF
+    target = (socket.gethostbyname(host), port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+
+    sent = {}  # sequence -> (monotonic, wall clock) send times
+    received = set()
+    rtts = []
+    offsets = []  # (rtt, clock offset) per reply
+    highest = -1
+    reordered = 0
+    duplicates = 0
+    last_rtt = None
+
+    interval = 1.0 / rate
+    start = time.monotonic()
+    next_send = start
+    sequence = 0
+    try:
+        while True:
+            now = time.monotonic()
+            if sequence < count:
+                wait = next_send - now
+            else:
+                wait = next_send - interval + timeout - now
+                if wait <= 0 or len(received) == count:
+                    break
+
+            readable, _, _ = select.select([sock], [], [], max(0.0, wait))
+            if readable:
+                while True:
+                    try:
+                        data, addr = sock.recvfrom(64)
+                    except (BlockingIOError, ConnectionResetError):
+                        # Windows reports an ICMP port unreachable as a reset
+                        break
+                    arrived, arrived_wall = time.monotonic(), time.time()
+                    pong = parse_pong(data)
+                    if pong is None or pong[0] not in sent:
+                        continue
+                    reply, _, server_time = pong
+                    if reply in received:
+                        duplicates += 1
+                        continue
+                    received.add(reply)
+                    if reply < highest:
+                        reordered += 1
+                    highest = max(highest, reply)
+
+                    sent_at, sent_wall = sent[reply]
+                    last_rtt = arrived - sent_at
+                    rtts.append(last_rtt)
+                    offsets.append((last_rtt, server_time - (sent_wall + arrived_wall) / 2))
+
+            now = time.monotonic()
+            if sequence < count and now >= next_send:
+                sent[sequence] = (now, time.time())
+                try:
+                    sock.sendto(build_ping(device_id, sequence, int(now * 1e6), last_rtt), target)
+                except OSError:
+                    pass  # Counted as lost
+                sequence += 1
+                next_send += interval
+    finally:
+        sock.close()
+
+    ordered = sorted(rtts)
+    # Jitter as the mean difference between consecutive round trips
+    jitter = 0.0
+    if len(rtts) > 1:
+        jitter = sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / (len(rtts) - 1)
+    # The least delayed replies give the best clock offset estimate
+    offset = None
+    if offsets:
+        offsets.sort()
+        best = offsets[:max(1, len(offsets) // 10)]
+        offset = sorted(o for _, o in best)[len(best) // 2]
+
+    return {
+        'target': f'{target[0]}:{target[1]}',
+        'sent': sequence,
+        'received': len(received),
+        'loss': 1.0 - len(received) / sequence if sequence else 0.0,
+        'reordered': reordered,
+        'duplicates': duplicates,
+        'rtt_min_ms': ordered[0] * 1000 if ordered else 0.0,
+        'rtt_p50_ms': _percentile(ordered, 50) * 1000,
+        'rtt_p95_ms': _percentile(ordered, 95) * 1000,
+        'rtt_p99_ms': _percentile(ordered, 99) * 1000,
+        'rtt_max_ms': ordered[-1] * 1000 if ordered else 0.0,
+        'jitter_ms': jitter * 1000,
+        'clock_offset_ms': None if offset is None else offset * 1000
+    }
+
+
+def format_probe(result):
+    """One-line summary of a run_probe() result"""
+    if not result['received']:
+        return f"No replies from {result['target']} ({result['sent']} pings sent)"
+    line = (f"RTT {result['rtt_p50_ms']:.1f} / {result['rtt_p95_ms']:.1f} / {result['rtt_p99_ms']:.1f} ms "
+            f"(p50/p95/p99), jitter {result['jitter_ms']:.1f} ms, loss {result['loss'] * 100:.1f}%, "
+            f"reordered {result['reordered']}")
+    if result['clock_offset_ms'] is not None:
+        line += f", clock offset {result['clock_offset_ms']:+.1f} ms"
+    return line
@@ -0,0 +1,118 @@
+"""
+Time-boxed cProfile and tracemalloc capture for --profile
+
+ProfileWindow profiles the calling thread and every thread started after
+start() (the listener, injector and asyncio threads). After `seconds` it
+writes a .prof file for pstats or snakeviz and prints the hottest functions,
+the largest allocation sites seen by tracemalloc and the span summary.
+
+On Python 3.12+ cProfile runs on sys.monitoring, which covers every thread
+and allows a single active profiler, so one Profile is enabled for the
+whole window. Older versions need one Profile per thread, and a thread's
+profiler can only be removed from that thread: each thread gets a trace
+function, called on every Python function call, that enables its Profile
+and removes it again at the first call after the window.
+"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import tracemalloc
+
+import spans
+
+# cProfile on sys.monitoring: one profiler for all threads
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+
+class ProfileWindow:
+    """cProfile + tracemalloc across all threads for a fixed number of seconds"""
+
+    def __init__(self, seconds=30.0, path='gamewalking.prof', top=15):
+        self.seconds = seconds
+        self.path = path
+        self.top = top
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.timer = None
+        self.active = False
+
+    def start(self):
+        """Start profiling; call before the listener threads are started"""
+        tracemalloc.start()
+        self.active = True
+        if not SHARED_PROFILER:
+            threading.settrace(self._watch_thread)
+            sys.settrace(self._watch_thread)
+        self._add_profile()
+
+        self.timer = threading.Timer(self.seconds, self.finish)
+        self.timer.daemon = True
+        self.timer.start()
+        print(f"Profiling for {self.seconds:g} seconds")
+
+    def _add_profile(self):
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def _watch_thread(self, frame, event, arg):
+        # Per-thread trace function before 3.12: runs in the profiled thread,
+        # so it can enable that thread's Profile and remove it again
+        if event != 'call':
+            return None
+        if not self.active:
+            sys.setprofile(None)
+            sys.settrace(None)
+        elif sys.getprofile() is None:
+            self._add_profile()
+        return None
+
+    def finish(self):
+        """Stop profiling, write the .prof file and print the report"""
+        if not self.active:
+            return
+        self.active = False
+        if self.timer and self.timer is not threading.current_thread():
+            self.timer.cancel()
+        if not SHARED_PROFILER:
+            threading.settrace(None)
+            sys.setprofile(None)
+            sys.settrace(None)
+
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        with self.lock:
+            profiles = list(self.profiles)
+            self.profiles = []
+        stats = None
+        for profile in profiles:
+            # Disables the shared profiler; per-thread ones stop at their
+            # thread's next call
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+        print("=" * 60)
+        print(f"Profile of the last {self.seconds:g} seconds")
+        print("=" * 60)
+        if stats is not None:
+            stats.dump_stats(self.path)
+            print(f"cProfile data written to {self.path}")
+            stats.sort_stats('cumulative').print_stats(self.top)
+
+        print(f"Top {self.top} allocation sites:")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            print(f"  {stat}")
+
+        tracer = spans.TRACER
+        if tracer is not None:
+            print()
+            spans.print_summary(tracer)
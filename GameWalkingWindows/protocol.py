@@ -0,0 +1,185 @@
+"""
+GameWalking wire protocol
+
+Version 1 is the plain-text datagram "STEP" sent by older Android builds.
+
+Version 2 is a fixed 18-byte big-endian header:
+
+    offset  size  field
+    0       1     magic/version (0xB2: magic nibble 0xB, version 2)
+    1       1     message type
+    2       2     device id
+    4       4     sequence number (wraps at 2**32)
+    8       8     sender monotonic timestamp in microseconds
+    16      2     step count carried by this packet
+
+Message types:
+
+    1  STEP   steps detected on the phone, step count = number of steps;
+              the header may be followed by copies of the sender's previous
+              STEP packets so a lost datagram is recovered from the next one:
+
+                  18      1     number of copies R
+                  19      8*R   per copy: uint16 sequence distance back,
+                                uint16 step count, uint32 microseconds
+                                before this packet's timestamp
+
+    2  ACCEL  raw accelerometer frames for server-side step detection;
+              the step count field holds the number of samples N and the
+              header is followed by:
+
+                  18      2     sample rate in Hz
+                  20      6*N   N samples of x, y, z as int16 in 0.01 m/s^2
+
+              The sender timestamp is the time of the first sample.
+
+    3  PING   link probe (test_network.py --probe); the step count field
+              holds the prober's latest round-trip time in units of 100 us
+              (0 = none yet) so the PC can show it too
+
+    4  PONG   reply to a PING: the PING header with the type changed,
+              followed by:
+
+                  18      8     PC wall clock at receipt, microseconds
+                                since the epoch
+"""
+
+import struct
+
+MAGIC_V2 = 0xB2
+HEADER_V2 = struct.Struct('!BBHIQH')
+HEADER_SIZE = HEADER_V2.size
+
+MSG_STEP = 1
+MSG_ACCEL = 2
+MSG_PING = 3
+MSG_PONG = 4
+
+ACCEL_RATE = struct.Struct('!H')
+ACCEL_OFFSET = HEADER_SIZE + ACCEL_RATE.size
+ACCEL_SAMPLE_SIZE = 6
+ACCEL_SCALE = 0.01  # m/s^2 per unit
+
+STEP_REDUNDANCY = struct.Struct('!B')
+REDUNDANT_STEP = struct.Struct('!HHI')
+REDUNDANT_OFFSET = HEADER_SIZE + STEP_REDUNDANCY.size
+
+PONG_TIME = struct.Struct('!Q')
+PONG_SIZE = HEADER_SIZE + PONG_TIME.size
+RTT_UNIT = 100e-6  # Seconds per unit of a PING's reported round-trip time
+
+LEGACY_STEP = b'STEP'
+SEQUENCE_MODULO = 1 << 32
+
+
+class Message:
+    """A decoded datagram"""
+    __slots__ = ('version', 'msg_type', 'device_id', 'sequence', 'sender_time', 'step_count')
+
+    def __init__(self, version, msg_type, device_id, sequence, sender_time, step_count):
+        self.version = version
+        self.msg_type = msg_type
+        self.device_id = device_id
+        self.sequence = sequence
+        self.sender_time = sender_time
+        self.step_count = step_count
+
+
+def parse_packet(data, length=None):
+    """Decode a datagram (bytes, bytearray or memoryview), or return None if unrecognised"""
+    if length is None:
+        length = len(data)
+
+    if length >= HEADER_SIZE and data[0] == MAGIC_V2:
+        magic, msg_type, device_id, sequence, sender_time, step_count = HEADER_V2.unpack_from(data)
+        return Message(2, msg_type, device_id, sequence, sender_time, step_count)
+
+    # Legacy text protocol, tolerate surrounding whitespace like the old decoder
+    if 4 <= length <= 16 and bytes(data[:length]).strip() == LEGACY_STEP:
+        return Message(1, MSG_STEP, None, None, None, 1)
+
+    return None
+
+
+def build_packet(msg_type, device_id, sequence, sender_time, step_count=1):
+    """Encode a version 2 datagram"""
+    return HEADER_V2.pack(MAGIC_V2, msg_type, device_id & 0xFFFF,
+                          sequence % SEQUENCE_MODULO, sender_time, step_count)
+
+
+def parse_redundant_steps(data, length, message):
+    """Decode the repeated earlier steps of a STEP datagram as Messages, oldest first"""
+    if length is None:
+        length = len(data)
+    if length < REDUNDANT_OFFSET:
+        return []
+
+    count = min(data[HEADER_SIZE], (length - REDUNDANT_OFFSET) // REDUNDANT_STEP.size)
+    steps = []
+    for offset in range(REDUNDANT_OFFSET, REDUNDANT_OFFSET + count * REDUNDANT_STEP.size, REDUNDANT_STEP.size):
+        distance, step_count, age = REDUNDANT_STEP.unpack_from(data, offset)
+        if distance == 0:
+            continue
+        steps.append(Message(2, MSG_STEP, message.device_id,
+                             (message.sequence - distance) % SEQUENCE_MODULO,
+                             message.sender_time - age, step_count))
+    steps.sort(key=lambda step: step.sender_time)
+    return steps
+
+
+def build_step_packet(device_id, sequence, sender_time, step_count=1, history=()):
+    """Encode a STEP datagram repeating earlier (sequence, sender_time, step_count) steps"""
+    history = list(history)
+    body = STEP_REDUNDANCY.pack(len(history))
+    for previous, previous_time, previous_count in history:
+        body += REDUNDANT_STEP.pack((sequence - previous) % (1 << 16), previous_count,
+                                    max(0, sender_time - previous_time) & 0xFFFFFFFF)
+    return build_packet(MSG_STEP, device_id, sequence, sender_time, step_count) + body
+
+
+def accel_sample_rate(data):
+    """Sample rate in Hz of an ACCEL datagram"""
+    return ACCEL_RATE.unpack_from(data, HEADER_SIZE)[0]
+
+
+def build_accel_packet(device_id, sequence, sender_time, sample_rate, samples):
+    """Encode an ACCEL datagram from an iterable of (x, y, z) in m/s^2"""
+    samples = list(samples)
+    values = []
+    for x, y, z in samples:
+        values.extend(max(-32768, min(32767, int(round(v / ACCEL_SCALE)))) for v in (x, y, z))
+    body = struct.pack(f'!H{len(values)}h', sample_rate, *values)
+    return build_packet(MSG_ACCEL, device_id, sequence, sender_time, len(samples)) + body
+
+
+def build_ping(device_id, sequence, sender_time, rtt=None):
+    """Encode a PING reporting the previous round-trip time in seconds"""
+    rtt_units = 0 if rtt is None else min(0xFFFF, max(1, int(round(rtt / RTT_UNIT))))
+    return build_packet(MSG_PING, device_id, sequence, sender_time, rtt_units)
+
+
+def build_pong(data, received_at):
+    """Encode the reply to a PING datagram, received_at in seconds since the epoch"""
+    pong = bytearray(data[:HEADER_SIZE])
+    pong[1] = MSG_PONG
+    return bytes(pong) + PONG_TIME.pack(int(received_at * 1e6))
+
+
+def parse_pong(data):
+    """(sequence, sender_time, PC receive time in seconds) of a PONG, or None"""
+    if len(data) < PONG_SIZE or data[0] != MAGIC_V2 or data[1] != MSG_PONG:
+        return None
+    magic, msg_type, device_id, sequence, sender_time, step_count = HEADER_V2.unpack_from(data)
+    return sequence, sender_time, PONG_TIME.unpack_from(data, HEADER_SIZE)[0] / 1e6
+
+
+def sequence_gap(previous, current):
+    """Number of packets between two sequence numbers, accounting for wrap-around
+
+    Returns 1 for the next packet in order, more than 1 when packets were
+    lost, and 0 or less for duplicates and reordered packets.
+    """
+    delta = (current - previous) % SEQUENCE_MODULO
+    if delta >= SEQUENCE_MODULO // 2:
+        return delta - SEQUENCE_MODULO
+    return delta
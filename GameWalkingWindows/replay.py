@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Replay a packet capture through the GameWalking listener
+
+Feeds every datagram of a capture recorded with `main.py --capture FILE`
+through UDPListener's packet processing path (no socket involved), either
+with the original timing or as fast as possible, and reports what the
+pipeline did with it. Key presses go to the in-memory recording backend,
+so replays are safe to run anywhere and can serve as a regression and
+performance corpus. Use --json for machine-readable output.
+
+A fast replay runs on the capture's clock: every packet carries its
+recorded receive time and the injector is driven from the replay thread,
+so the stale check, sessions, cadence and step pacing see the original
+timing and the results do not depend on machine speed.
+
+Examples:
+    python replay.py session.gwcap
+    python replay.py session.gwcap --speed 4
+    python replay.py session.gwcap --fast --json results.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+
+from capture import read_capture
+from key_backends import RecordingBackend
+from key_sender import KeySender
+from udp_listener import UDPListener
+
+
+def replay(path, speed=1.0, fast=False, hold=0.0):
+    """Replay a capture and return the results dict"""
+    backend = RecordingBackend()
+    key_sender = KeySender(backend)
+    key_sender.key_hold_duration = hold
+    key_sender.release_gap = 0.0
+    key_sender.debug_mode = False
+    key_sender.activate()
+    listener = UDPListener(key_sender)
+    listener.debug_mode = False
+    listener.injector.debug_mode = False
+    injector = listener.injector
+
+    if fast:
+        listener.movement.start()
+    else:
+        injector.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    packets = 0
+    capture_seconds = 0.0
+    next_release = None
+    for offset, addr, data in read_capture(path):
+        if fast:
+            # The capture's own time (seconds since its first packet) is the clock;
+            # paced steps due before this packet go first, at their own time
+            while next_release is not None and next_release <= offset:
+                next_release = injector.run_pending(next_release)
+            listener._process_packet(data, addr, received_at=offset)
+            next_release = injector.run_pending(offset)
+        else:
+            delay = wall_start + offset / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            listener._process_packet(data, addr)
+        packets += 1
+        capture_seconds = offset
+
+    if fast:
+        while next_release is not None:
+            next_release = injector.run_pending(next_release)
+        listener.movement.stop()
+    else:
+        # Give the injector time to drain, including steps the shaper is pacing
+        drain_deadline = time.perf_counter() + 5.0
+        while ((listener.step_queue.depth() or listener.shaper.pending)
+               and time.perf_counter() < drain_deadline):
+            time.sleep(0.01)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    injector.stop()
+    key_sender.deactivate()
+    status = listener.get_status()
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'capture': os.path.basename(path),
+        'capture_bytes': os.path.getsize(path),
+        'mode': 'fast' if fast else f'{speed:g}x',
+        'packets': packets,
+        'capture_seconds': capture_seconds,
+        'steps_received': status['steps_received'],
+        'steps_injected': status['steps_injected'],
+        'key_presses': backend.presses(),
+        'parse_errors': status['parse_errors'],
+        'packets_lost': status['packets_lost'],
+        'packets_duplicate': status['packets_duplicate'],
+        'packets_recovered': status['packets_recovered'],
+        'steps_stale': status['steps_stale'],
+        'queue_dropped': status['queue_dropped'],
+        'devices': status['active_devices'],
+        'packets_per_sec': packets / wall if wall > 0 else 0.0,
+        'cpu_us_per_packet': cpu * 1e6 / packets if packets else 0.0,
+        'wall_seconds': wall
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a GameWalking packet capture')
+    parser.add_argument('capture', help='Capture file written by main.py --capture')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed factor for timed replay')
+    parser.add_argument('--fast', action='store_true', help='Replay as fast as possible, ignoring timing')
+    parser.add_argument('--hold', type=float, default=0.0, help='Simulated seconds per key injection')
+    parser.add_argument('--json', metavar='FILE', help="Write results as JSON ('-' for stdout)")
+
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error('--speed must be positive')
+
+    # Keep stdout clean for machine-readable output
+    with contextlib.redirect_stdout(sys.stderr):
+        results = replay(args.capture, args.speed, args.fast, args.hold)
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print()
+    print(f"Replayed:   {results['packets']} packets, {results['capture_seconds']:.1f} s of capture "
+          f"({results['capture_bytes']} bytes) at {results['mode']}")
+    print(f"Steps:      {results['steps_received']} received, {results['steps_injected']} injected, "
+          f"{results['key_presses']} key presses")
+    print(f"Network:    {results['packets_lost']} lost, {results['packets_duplicate']} duplicate, "
+          f"{results['packets_recovered']} recovered, {results['steps_stale']} stale, "
+          f"{results['parse_errors']} parse errors")
+    print(f"Speed:      {results['packets_per_sec']:.0f} packets/s, "
+          f"{results['cpu_us_per_packet']:.1f} us CPU per packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import time
+from movement import CadenceTracker
+from latency import ClockOffsetEstimator
+from protocol import sequence_gap
+from timeseries import StepSeries
+
+# SequenceWindow.accept() results
+SEQ_NEW = 0        # newest sequence so far (window.skipped tells how many were jumped)
+SEQ_LATE = 1       # fills a hole inside the window
+SEQ_DUPLICATE = 2  # already seen
+SEQ_TOO_OLD = 3    # behind the window, cannot tell
+SEQ_EARLY = 4      # from before the first sequence seen, never counted as lost
+
+
+class SequenceWindow:
+    """Sliding window over the last `size` sequence numbers of one sender
+
+    Bit i of `bits` is set when sequence (highest - i) has been seen, so
+    deduplication and hole filling are a shift and a mask, O(1) per packet.
+    """
+    __slots__ = ('size', 'mask', 'origin', 'highest', 'bits', 'skipped')
+
+    def __init__(self, size=64):
+        self.size = size
+        self.mask = (1 << size) - 1
+        self.origin = None
+        self.highest = None
+        self.bits = 0
+        self.skipped = 0
+
+    def accept(self, sequence):
+        """Record a sequence number and classify it"""
+        self.skipped = 0
+        if self.highest is None:
+            self.origin = sequence
+            self.highest = sequence
+            self.bits = 1
+            return SEQ_NEW
+
+        gap = sequence_gap(self.highest, sequence)
+        if gap > 0:
+            self.skipped = gap - 1
+            self.bits = ((self.bits << gap) | 1) & self.mask if gap < self.size else 1
+            self.highest = sequence
+            return SEQ_NEW
+
+        behind = -gap
+        if behind >= self.size:
+            return SEQ_TOO_OLD
+        bit = 1 << behind
+        if self.bits & bit:
+            return SEQ_DUPLICATE
+        self.bits |= bit
+        if sequence_gap(self.origin, sequence) < 0:
+            return SEQ_EARLY
+        return SEQ_LATE
+
+
+class Session:
+    """Per-device state, looked up on every packet"""
+    __slots__ = ('key', 'addr', 'device_id', 'forward_key', 'steps', 'packets',
+                 'first_seen', 'last_seen', 'live', 'window', 'cadence', 'clock', 'detector', 'history')
+
+    def __init__(self, key, addr, device_id, forward_key, now, history):
+        self.key = key
+        self.addr = addr
+        self.device_id = device_id
+        self.forward_key = forward_key
+        self.steps = 0
+        self.packets = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.live = False  # Set by SessionTable.mark_live() while the phone keeps sending
+        self.window = SequenceWindow()
+        self.cadence = CadenceTracker()
+        self.clock = ClockOffsetEstimator()
+        self.detector = None  # AccelStepDetector, created on the first ACCEL packet
+        self.history = history  # StepSeries of recent steps
+
+    def name(self):
+        """Human readable device name"""
+        if self.device_id is None:
+            return self.addr[0]
+        return f"{self.addr[0]}#{self.device_id}"
+
+    def to_dict(self, now):
+        return {
+            'device': self.name(),
+            'forward_key': self.forward_key or 'default',
+            'steps': self.steps,
+            'packets': self.packets,
+            'cadence': self.cadence.cadence(),
+            'idle': now - self.last_seen,
+            'live': self.live,
+            'history': self.history.stats(now)
+        }
+
+
+class SessionTable:
+    """Sessions keyed by (sender IP, device id) with liveness and idle eviction
+
+    A session counts as live from its first packet until it has been silent
+    for the listener's liveness timeout, and is forgotten after idle_timeout.
+
+    Per-player keys come from the [PLAYERS] config section, matched first on
+    ``device_<id>`` and then on the sender IP, e.g.::
+
+        [PLAYERS]
+        device_4711 = up
+        192.168.1.23 = w
+    """
+
+    def __init__(self, config, idle_timeout=30.0):
+        self.config = config
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        # Called with each session before it is evicted
+        self.on_evict = None
+
+        # Step history kept per session, see timeseries.py
+        self.history_capacity = config.getint('HISTORY', 'capacity', 4096)
+        self.cadence_window = config.getfloat('HISTORY', 'cadence_window', 10.0)
+
+        # Statistics
+        self.sessions_evicted = 0
+        self.live_count = 0
+
+    def lookup(self, addr, device_id, now):
+        """Return the session for a sender, creating it on first contact"""
+        key = (addr[0], device_id)
+        session = self.sessions.get(key)
+        if session is None:
+            session = Session(key, addr, device_id, self._key_for(addr, device_id), now,
+                              StepSeries(self.history_capacity, self.cadence_window))
+            self.sessions[key] = session
+        else:
+            session.addr = addr
+            session.last_seen = now
+        return session
+
+    def _key_for(self, addr, device_id):
+        """Resolve the forward key mapped to a device (None means KeySender's default)"""
+        key = None
+        if device_id is not None:
+            key = self.config.get('PLAYERS', f'device_{device_id}', None)
+        if key is None:
+            key = self.config.get('PLAYERS', addr[0], None)
+        return key or None
+
+    def evict_idle(self, now=None):
+        """Drop sessions that have been silent for longer than idle_timeout"""
+        if now is None:
+            now = time.time()
+
+        idle = [key for key, session in self.sessions.items()
+                if now - session.last_seen > self.idle_timeout]
+        for key in idle:
+            session = self.sessions.pop(key)
+            if session.live:
+                self.live_count -= 1
+            if self.on_evict is not None:
+                self.on_evict(session)
+        self.sessions_evicted += len(idle)
+        return len(idle)
+
+    def mark_live(self, session):
+        """Count a session as live again after its first packet or a silence"""
+        if not session.live:
+            session.live = True
+            self.live_count += 1
+
+    def expire_silent(self, now, timeout):
+        """Stop counting sessions silent for longer than timeout as live, returns how many"""
+        expired = 0
+        for session in self.sessions.values():
+            if session.live and now - session.last_seen > timeout:
+                session.live = False
+                expired += 1
+        self.live_count -= expired
+        return expired
+
+    def next_deadline(self, liveness_timeout):
+        """Earliest time a session goes silent or idle, None without sessions"""
+        deadline = None
+        for session in self.sessions.values():
+            if session.live:
+                due = session.last_seen + liveness_timeout
+            else:
+                due = session.last_seen + self.idle_timeout
+            if deadline is None or due < deadline:
+                deadline = due
+        return deadline
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get_stats(self, now=None):
+        if now is None:
+            now = time.time()
+        return {
+            'active_devices': self.live_count,
+            'known_devices': len(self.sessions),
+            'sessions_evicted': self.sessions_evicted,
+            'sessions': [session.to_dict(now) for session in list(self.sessions.values())]
+        }
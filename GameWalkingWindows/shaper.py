@@ -0,0 +1,135 @@
+import time
+
+
+class TokenBucket:
+    """Pacing state for one device, constant size"""
+    __slots__ = ('tokens', 'updated', 'backlog', 'key')
+
+    def __init__(self, tokens, now, key):
+        self.tokens = tokens
+        self.updated = now
+        self.backlog = 0
+        self.key = key
+
+
+class StepShaper:
+    """Per-device token bucket between the step queue and the movement engine
+
+    Each device may move `burst` steps at once and then one step every
+    KeySender.step_duration seconds. Steps beyond that (e.g. step-counter
+    catch-ups after the phone slept) wait in a per-device backlog of at most
+    `burst` steps and are released at the paced rate by the injector thread;
+    anything more is dropped. A step_duration of 0 turns shaping off.
+    """
+
+    def __init__(self, key_sender, burst=4):
+        self.key_sender = key_sender
+        self.burst = max(1, burst)
+        self.buckets = {}
+        self.pending = set()  # Devices with a backlog
+        self.last_prune = 0.0
+
+        # Statistics
+        self.steps_shaped = 0
+        self.steps_dropped = 0
+
+    def _refill(self, bucket, now, interval):
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) / interval)
+        bucket.updated = now
+
+    def admit(self, event, now=None):
+        """Number of the event's steps that may be injected right away"""
+        interval = self.key_sender.step_duration
+        if interval <= 0:
+            return event.count
+        if now is None:
+            now = time.monotonic()
+
+        device = (event.addr[0] if event.addr else None, event.device_id)
+        bucket = self.buckets.get(device)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now, event.key)
+            self.buckets[device] = bucket
+        else:
+            bucket.key = event.key
+            self._refill(bucket, now, interval)
+
+        # Steps already waiting go first
+        allowed = 0 if bucket.backlog else min(event.count, int(bucket.tokens))
+        bucket.tokens -= allowed
+
+        excess = event.count - allowed
+        if excess:
+            room = self.burst - bucket.backlog
+            delayed = min(excess, room)
+            bucket.backlog += delayed
+            self.steps_shaped += delayed
+            self.steps_dropped += excess - delayed
+            if bucket.backlog:
+                self.pending.add(device)
+
+        if now - self.last_prune > 10.0:
+            self._prune(now, interval)
+        return allowed
+
+    def release(self, now=None):
+        """(key, count) pairs of backlogged steps whose turn has come"""
+        if not self.pending:
+            return []
+        if now is None:
+            now = time.monotonic()
+
+        interval = self.key_sender.step_duration
+        released = []
+        for device in list(self.pending):
+            bucket = self.buckets[device]
+            if interval > 0:
+                self._refill(bucket, now, interval)
+                count = min(bucket.backlog, int(bucket.tokens + 1e-9))
+            else:
+                count = bucket.backlog  # Shaping was turned off, flush
+            if count:
+                bucket.tokens -= count
+                bucket.backlog -= count
+                released.append((bucket.key, count))
+            if not bucket.backlog:
+                self.pending.discard(device)
+        return released
+
+    def next_release(self, now=None):
+        """Seconds until the next backlogged step is due, None without backlog"""
+        if not self.pending:
+            return None
+        if now is None:
+            now = time.monotonic()
+
+        interval = self.key_sender.step_duration
+        if interval <= 0:
+            return 0.0
+        wait = min((1.0 - self.buckets[device].tokens) * interval - (now - self.buckets[device].updated)
+                   for device in self.pending)
+        return max(0.0, wait)
+
+    def _prune(self, now, interval):
+        """Forget buckets that have refilled completely, a new bucket starts full anyway"""
+        self.last_prune = now
+        full = [device for device, bucket in self.buckets.items()
+                if not bucket.backlog and bucket.tokens + (now - bucket.updated) / interval >= self.burst]
+        for device in full:
+            del self.buckets[device]
+
+    def clear(self):
+        self.buckets.clear()
+        self.pending.clear()
+
+    def get_stats(self):
+        return {
+            'steps_shaped': self.steps_shaped,
+            'steps_dropped_by_shaper': self.steps_dropped,
+            'steps_backlogged': sum(bucket.backlog for bucket in list(self.buckets.values()))
+        }
+
+
+def create_shaper(key_sender, config):
+    """Build the step shaper from the CONTROLS section"""
+    return StepShaper(key_sender, config.getint('CONTROLS', 'step_burst', 4))
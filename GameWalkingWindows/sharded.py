@@ -0,0 +1,322 @@
+"""
+Sharded multi-process listener for many phones on one PC
+
+N worker processes bind the same UDP port with SO_REUSEPORT, so the kernel
+spreads senders (by address/port hash) across them and a phone always lands
+on the same worker. Each worker runs the normal UDPListener receive path:
+parsing, sessions, deduplication, stale dropping and accelerometer step
+detection. Instead of queueing steps for key injection, it sums them per
+device for every received batch and sends one compact record per device
+over a pipe. The main process turns those records back into StepEvents for
+its StepQueue, so key injection, pacing and the GUI stay in one place.
+
+Where SO_REUSEPORT is missing (Windows) a single worker process is used,
+which still moves packet handling off the GUI process.
+"""
+
+import json
+import multiprocessing
+import socket
+import struct
+import threading
+import time
+from multiprocessing.connection import wait
+
+from log_setup import setup_worker_logging
+from step_queue import StepEvent
+from udp_listener import UDPListener, log
+
+# Pipe messages start with a one-byte type
+MSG_EVENTS = b'E'
+MSG_STATS = b'S'
+
+# Aggregated steps of one device: IPv4, port, device id (NO_DEVICE if none),
+# steps, received_at, sender_time (0 if none), network delay, key length
+EVENT = struct.Struct('!4sHIHdQfB')
+NO_DEVICE = 0xFFFFFFFF
+
+# Worker counters summed into the main process status
+WORKER_COUNTERS = ('packets_received', 'parse_errors', 'socket_errors', 'packets_lost',
+                   'packets_out_of_order', 'packets_duplicate', 'packets_recovered',
+                   'steps_stale', 'accel_samples', 'sessions_evicted', 'kernel_drops',
+                   'packets_shed', 'receive_backlog_bytes', 'pings_answered')
+
+
+class _StepAggregator:
+    """Stands in for the StepQueue inside a worker, summing steps per device
+
+    depth() reports the main process's StepQueue depth, shared through
+    queue_depth, so load shedding in the worker reacts to the injector
+    falling behind.
+    """
+
+    def __init__(self, queue_depth):
+        self.pending = {}
+        self.queue_depth = queue_depth
+
+    def put(self, event):
+        device = (event.addr, event.device_id, event.key)
+        aggregate = self.pending.get(device)
+        if aggregate is None:
+            self.pending[device] = [event.count, event.received_at, event.sender_time or 0,
+                                    event.network_delay]
+        else:
+            aggregate[0] += event.count
+            if event.sender_time and event.sender_time > aggregate[2]:
+                aggregate[2] = event.sender_time
+            if event.network_delay > aggregate[3]:
+                aggregate[3] = event.network_delay
+        return True
+
+    def depth(self):
+        return self.queue_depth.value
+
+    def take(self):
+        """Encode and clear the pending aggregates"""
+        records = [MSG_EVENTS]
+        for (addr, device_id, key), (count, received_at, sender_time, delay) in self.pending.items():
+            key_bytes = key.encode('utf-8') if key else b''
+            records.append(EVENT.pack(socket.inet_aton(addr[0]), addr[1],
+                                      NO_DEVICE if device_id is None else device_id,
+                                      min(count, 0xFFFF), received_at, sender_time, delay,
+                                      len(key_bytes)))
+            records.append(key_bytes)
+        self.pending.clear()
+        return b''.join(records)
+
+
+class _ShardWorker(UDPListener):
+    """UDPListener running inside a worker process"""
+
+    def __init__(self, conn, stop_event, reuse_port, queue_depth):
+        super().__init__(None)
+        self.conn = conn
+        self.stop_event = stop_event
+        self.reuse_port = reuse_port
+        self.receive_engine = 'batched'
+        self.step_queue = _StepAggregator(queue_depth)
+
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            if self.reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._configure_socket(sock)
+            sock.bind(('', self.port))
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def run(self):
+        """Receive until the main process sets the stop event"""
+        self.socket = self._open_socket()
+        self.socket.setblocking(False)
+        self._open_wakeup()
+        self.is_listening = True
+        self.connection_status = "Listening"
+        try:
+            self._listen_loop()
+        finally:
+            self._close_sockets()
+
+    def _process_batch(self, buffers, sizes, addrs, count):
+        super()._process_batch(buffers, sizes, addrs, count)
+        if self.step_queue.pending:
+            self.conn.send_bytes(self.step_queue.take())
+
+    def _maintenance_deadline(self):
+        # The stop event cannot be selected on, so check it at least once a second
+        deadline = super()._maintenance_deadline()
+        poll = time.time() + 1.0
+        return poll if deadline is None or poll < deadline else deadline
+
+    def _run_maintenance(self, now):
+        super()._run_maintenance(now)
+        if self.stop_event.is_set():
+            self.is_listening = False
+            return
+
+        stats = {key: getattr(self, key, 0) for key in WORKER_COUNTERS}
+        stats.update(self.sessions.get_stats(now))
+        stats['link_probe'] = self._link_probe_summary()
+        self.conn.send_bytes(MSG_STATS + json.dumps(stats).encode('utf-8'))
+
+
+def _run_worker(port, conn, stop_event, reuse_port, queue_depth):
+    """Worker process entry point"""
+    setup_worker_logging()
+    worker = _ShardWorker(conn, stop_event, reuse_port, queue_depth)
+    worker.port = port
+    worker.debug_mode = False
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        log.exception("Listener worker failed: %s", e)
+    finally:
+        conn.close()
+
+
+class ShardedUDPListener(UDPListener):
+    """UDPListener whose receive path runs in `workers` processes"""
+
+    def __init__(self, key_sender, workers=None):
+        super().__init__(key_sender)
+        if workers is None:
+            workers = self.config.getint('NETWORK', 'workers', 2)
+        self.reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        if not self.reuse_port and workers > 1:
+            log.warning("SO_REUSEPORT is not available on this system, using one listener worker")
+            workers = 1
+        self.workers = max(1, workers)
+        # The injector's queue depth, shared with the workers for load shedding
+        self.queue_depth = multiprocessing.Value('i', 0, lock=False)
+        self.step_queue.depth_mirror = self.queue_depth
+
+        self.processes = []
+        self.connections = []
+        self.stop_event = None
+        self.worker_stats = {}
+
+    def start_listening(self):
+        """Start the worker processes and the collector thread"""
+        if self.is_listening:
+            log.warning("Listener already running")
+            return False
+
+        # Check the port first so a busy port is reported here, not in every worker
+        try:
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.reuse_port:
+                probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            probe.bind(('', self.port))
+            probe.close()
+        except socket.error as e:
+            log.error("Failed to start UDP listener: %s", e)
+            self.connection_status = f"Error: {e}"
+            self._publish_status()
+            return False
+
+        self.stop_event = multiprocessing.Event()
+        self.worker_stats = {}
+        for index in range(self.workers):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_worker, daemon=True,
+                                              args=(self.port, sender, self.stop_event, self.reuse_port,
+                                                    self.queue_depth),
+                                              name=f'GameWalkingListener-{index}')
+            process.start()
+            sender.close()
+            self.processes.append(process)
+            self.connections.append(receiver)
+
+        self.is_listening = True
+        self.connection_status = "Listening"
+        self.injector.start()
+
+        self.listener_thread = threading.Thread(target=self._collect_loop, daemon=True)
+        self.listener_thread.start()
+
+        log.info("UDP Listener started on port %d with %d worker process(es)", self.port, self.workers)
+        self._publish_status()
+        return True
+
+    def stop_listening(self):
+        """Stop the workers, the collector and the injector"""
+        if not self.is_listening:
+            log.warning("Listener not running")
+            return
+
+        self.is_listening = False
+        self.connection_status = "Stopping"
+        self.stop_event.set()
+        # Frees the collector thread if it waits in put() (block policy)
+        self.step_queue.close()
+
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self.listener_thread and self.listener_thread.is_alive():
+            self.listener_thread.join(timeout=2.0)
+        for conn in self.connections:
+            conn.close()
+        self.processes = []
+        self.connections = []
+
+        self.injector.stop()
+
+        self.connection_status = "Disconnected"
+        log.info("UDP Listener stopped")
+        self._publish_status()
+
+    def _collect_loop(self):
+        """Turn worker records into StepEvents for the injector"""
+        connections = list(self.connections)
+        while connections:
+            for conn in wait(connections, timeout=1.0):
+                try:
+                    message = conn.recv_bytes()
+                except (EOFError, OSError):
+                    connections.remove(conn)
+                    continue
+
+                if message[:1] == MSG_EVENTS:
+                    self._handle_events(message)
+                elif message[:1] == MSG_STATS:
+                    self.worker_stats[id(conn)] = json.loads(message[1:])
+                    self._refresh_connection_status()
+                    self._publish_status()
+
+        log.info("Listener loop ended")
+
+    def _handle_events(self, message):
+        offset = 1
+        size = len(message)
+        now = time.time()
+        while offset + EVENT.size <= size:
+            ip, port, device_id, count, received_at, sender_time, delay, key_length = \
+                EVENT.unpack_from(message, offset)
+            offset += EVENT.size
+            key = message[offset:offset + key_length].decode('utf-8') or None
+            offset += key_length
+
+            self.step_queue.put(StepEvent((socket.inet_ntoa(ip), port), received_at, count,
+                                          None if device_id == NO_DEVICE else device_id,
+                                          sender_time or None, key, delay))
+            self.steps_received += count
+            self.last_step_time = now
+            self.latency.record('network', delay)
+
+        self._publish_status()
+
+    def _refresh_connection_status(self, session=None):
+        if not self.is_listening:
+            return
+        devices = sum(stats.get('active_devices', 0) for stats in list(self.worker_stats.values()))
+        if devices == 0:
+            self.connection_status = "Listening"
+        elif devices == 1:
+            self.connection_status = "Connected to 1 device"
+        else:
+            self.connection_status = f"Connected to {devices} devices"
+
+    def get_status(self):
+        """Listener status with the worker counters and sessions merged in"""
+        status = super().get_status()
+        workers = list(self.worker_stats.values())
+        for key in WORKER_COUNTERS:
+            values = [stats[key] for stats in workers if stats.get(key) is not None]
+            # Counters no worker can measure (kernel_drops without /proc/net/udp) stay unknown
+            status[key] = sum(values) if values or not workers else None
+        status['active_devices'] = sum(stats.get('active_devices', 0) for stats in workers)
+        status['sessions'] = [session for stats in workers for session in stats.get('sessions', [])]
+        probes = [stats['link_probe'] for stats in workers if stats.get('link_probe')]
+        status['link_probe'] = min(probes, key=lambda probe: probe['age']) if probes else None
+        status['workers'] = self.workers
+        return status
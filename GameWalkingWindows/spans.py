@@ -0,0 +1,142 @@
+"""
+Hot-path timing spans
+
+Instrumented code reads the module-level TRACER once and only takes
+timestamps when it is set:
+
+    tracer = spans.TRACER
+    if tracer is not None:
+        start = time.perf_counter()
+    ... stage ...
+    if tracer is not None:
+        tracer.record('parse', start)
+
+With instrumentation off (the default) a span costs one global lookup and a
+None comparison. When on, every span lands in a per-name histogram and is
+passed to the subscribed hooks, e.g. ConsoleHook or TraceFileHook.
+
+Span names used in the app:
+
+    receive          draining pending datagrams (batched receive engine)
+    parse            decoding one datagram
+    handle_step      sessions, stale check and queueing for one step message
+    handle_accel     step detection on one accelerometer batch
+    key_lock_wait    waiting for KeySender.lock
+    key_down/key_up  the key backend calls (PyAutoGUI, SendInput, ...)
+    gui_update       one status refresh of the Tk window
+    gui_log          one batch of activity log lines into the Text widget
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from latency import LatencyHistogram
+
+log = logging.getLogger('gamewalking.spans')
+
+TRACER = None
+
+
+class Tracer:
+    """Collects spans into histograms and fans them out to hooks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.hooks = []
+
+    def record(self, name, start, end=None):
+        """Record a span that started at perf_counter() time `start`"""
+        if end is None:
+            end = time.perf_counter()
+        duration = end - start
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(duration)
+        for hook in self.hooks:
+            hook(name, start, duration)
+
+    def subscribe(self, hook):
+        """Call hook(name, start, duration) for every span, from the recording thread"""
+        self.hooks = self.hooks + [hook]
+
+    def unsubscribe(self, hook):
+        self.hooks = [h for h in self.hooks if h is not hook]
+
+    def snapshot(self):
+        """Copies of each span's (bucket counts, count, total seconds)"""
+        with self.lock:
+            return {name: (list(histogram.counts), histogram.count, histogram.total)
+                    for name, histogram in self.histograms.items()}
+
+    def summary(self):
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+
+def enable():
+    """Turn span recording on and return the tracer"""
+    global TRACER
+    if TRACER is None:
+        TRACER = Tracer()
+    return TRACER
+
+
+def disable():
+    global TRACER
+    TRACER = None
+
+
+def print_summary(tracer):
+    """Print count and p50/p95/p99/max per span"""
+    summary = tracer.summary()
+    if not summary:
+        print("No spans recorded")
+        return
+    print(f"{'span':<16}{'count':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in sorted(summary):
+        s = summary[name]
+        print(f"{name:<16}{s['count']:>9}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}"
+              f"{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+
+
+class ConsoleHook:
+    """Log spans slower than a threshold (rate-limited like other per-event messages)"""
+
+    def __init__(self, threshold_ms=5.0):
+        self.threshold = threshold_ms / 1000.0
+
+    def __call__(self, name, start, duration):
+        if duration >= self.threshold:
+            log.warning("Slow span %s: %.2f ms", name, duration * 1000, extra={'event': 'slow_span'})
+
+
+class TraceFileHook:
+    """Write spans as Chrome trace events (open in chrome://tracing or Perfetto)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'w')
+        self.file.write('[\n')
+        self.pid = os.getpid()
+
+    def __call__(self, name, start, duration):
+        event = json.dumps({'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6,
+                            'pid': self.pid, 'tid': threading.get_ident()})
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(event + ',\n')
+
+    def close(self):
+        # The trace format tolerates the trailing comma and missing bracket,
+        # but close the array properly when we can
+        with self.lock:
+            if not self.file.closed:
+                self.file.write('{}]\n')
+                self.file.close()
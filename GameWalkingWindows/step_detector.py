@@ -0,0 +1,110 @@
+"""
+Server-side step detection from raw accelerometer frames (protocol ACCEL)
+
+Needs NumPy, which is optional: without it ACCEL packets are ignored and
+phones with hardware step sensors keep working as before.
+
+Per batch of samples the detector
+
+1. computes the acceleration magnitude,
+2. band-passes it as (short trailing mean - long trailing mean), which
+   removes gravity/drift and high-frequency jitter with only half the short
+   window (~50 ms) of delay, using cumulative sums instead of per-sample loops,
+3. picks local maxima above an adaptive threshold derived from the spread
+   of the filtered signal over the last few seconds,
+4. enforces a minimum interval between steps.
+
+State carried between batches is bounded by the window lengths, so memory
+per device is constant.
+"""
+
+import numpy as np
+
+from protocol import ACCEL_OFFSET, ACCEL_SCALE
+
+# Phones report a measured sample rate that jitters a little from batch to
+# batch; only a larger change resizes the windows (which resets the stream)
+RATE_TOLERANCE = 0.05
+
+
+def decode_accel_samples(data, count):
+    """View the int16 x/y/z samples of an ACCEL datagram as an (N, 3) array"""
+    return np.frombuffer(data, dtype='>i2', count=count * 3, offset=ACCEL_OFFSET).reshape(count, 3)
+
+
+def _trailing_mean(cumsum, end, width):
+    """Mean of the `width` samples ending at each index in `end` (shorter at the start)"""
+    start = np.maximum(end + 1 - width, 0)
+    return (cumsum[end + 1] - cumsum[start]) / (end + 1 - start)
+
+
+class AccelStepDetector:
+    """Vectorized step detector for one device's accelerometer stream"""
+
+    def __init__(self, smooth_window=0.1, baseline_window=1.0, threshold_window=3.0,
+                 threshold_factor=1.2, min_threshold=0.8, min_step_interval=0.25):
+        self.smooth_window = smooth_window
+        self.baseline_window = baseline_window
+        self.threshold_window = threshold_window
+        self.threshold_factor = threshold_factor
+        self.min_threshold = min_threshold
+        self.min_step_interval = min_step_interval
+
+        self.sample_rate = 0
+        self.steps_detected = 0
+
+    def _configure(self, sample_rate):
+        """(Re)size the windows for a sample rate and reset the stream state"""
+        self.sample_rate = sample_rate
+        self.short_len = max(1, int(round(self.smooth_window * sample_rate)))
+        self.long_len = max(self.short_len + 1, int(round(self.baseline_window * sample_rate)))
+        self.threshold_len = max(1, int(round(self.threshold_window * sample_rate)))
+        self.min_interval = max(1, int(round(self.min_step_interval * sample_rate)))
+
+        self.raw_tail = np.empty(0, dtype=np.float64)
+        self.filtered_tail = np.empty(0, dtype=np.float64)
+        self.edge = np.empty(0, dtype=np.float64)
+        self.samples_seen = 0
+        self.last_step = -self.min_interval
+
+    def process(self, samples, sample_rate):
+        """Feed an (N, 3) int16 sample batch, return step offsets in seconds from its first sample"""
+        if sample_rate <= 0 or len(samples) == 0:
+            return []
+        if abs(sample_rate - self.sample_rate) > self.sample_rate * RATE_TOLERANCE:
+            self._configure(sample_rate)
+
+        xyz = samples.astype(np.float64)
+        magnitude = np.sqrt(np.einsum('ij,ij->i', xyz, xyz)) * ACCEL_SCALE
+
+        # Band-pass with two trailing means over the carried-over raw tail plus this batch
+        series = np.concatenate((self.raw_tail, magnitude))
+        cumsum = np.concatenate(([0.0], np.cumsum(series)))
+        end = np.arange(len(self.raw_tail), len(series))
+        filtered = _trailing_mean(cumsum, end, self.short_len) - _trailing_mean(cumsum, end, self.long_len)
+        self.raw_tail = series[-(self.long_len - 1):]
+
+        # Adaptive threshold from the recent spread of the filtered signal
+        window = np.concatenate((self.filtered_tail, filtered))[-self.threshold_len:]
+        self.filtered_tail = window
+        threshold = max(self.min_threshold, self.threshold_factor * float(window.std()))
+
+        # Local maxima; the last sample is judged with the next batch
+        signal = np.concatenate((self.edge, filtered))
+        first_index = self.samples_seen - len(self.edge)
+        middle = signal[1:-1]
+        peaks = np.flatnonzero((middle > signal[:-2]) & (middle >= signal[2:]) & (middle > threshold)) + 1
+        self.edge = signal[-2:]
+
+        batch_start = self.samples_seen
+        self.samples_seen += len(samples)
+
+        offsets = []
+        for peak in peaks:
+            index = first_index + int(peak)
+            if index - self.last_step >= self.min_interval:
+                self.last_step = index
+                offsets.append((index - batch_start) / sample_rate)
+
+        self.steps_detected += len(offsets)
+        return offsets
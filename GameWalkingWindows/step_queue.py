@@ -0,0 +1,245 @@
+import collections
+import logging
+import threading
+import time
+
+log = logging.getLogger('gamewalking.injector')
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce', 'block')
+
+
+class StepEvent:
+    """One or more steps from a single packet waiting for injection"""
+    __slots__ = ('addr', 'received_at', 'count', 'device_id', 'sender_time', 'key', 'network_delay')
+
+    def __init__(self, addr, received_at, count=1, device_id=None, sender_time=None, key=None,
+                 network_delay=0.0):
+        self.addr = addr
+        self.received_at = received_at
+        self.count = count
+        self.device_id = device_id
+        self.sender_time = sender_time
+        self.key = key
+        self.network_delay = network_delay
+
+
+class StepQueue:
+    """Bounded queue of step events between the UDP listener and the key sender"""
+
+    def __init__(self, maxsize=64, overflow_policy='drop_oldest'):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.maxsize = max(1, maxsize)
+        self.overflow_policy = overflow_policy
+
+        self._events = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        # Optional shared value (multiprocessing.Value) kept equal to the
+        # depth, read by listener worker processes for load shedding
+        self.depth_mirror = None
+
+        # Statistics
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def put(self, event):
+        """Add an event, applying the overflow policy when the queue is full"""
+        with self._lock:
+            if self._closed:
+                return False
+
+            if len(self._events) >= self.maxsize:
+                if self.overflow_policy == 'drop_oldest':
+                    self._events.popleft()
+                    self.dropped += 1
+                elif self.overflow_policy == 'coalesce':
+                    # Fold the new steps into the newest pending event from
+                    # the same device, so they move the right player's key
+                    for pending in reversed(self._events):
+                        if pending.addr == event.addr and pending.device_id == event.device_id:
+                            pending.count += event.count
+                            self.coalesced += event.count
+                            return True
+                    # Nothing of this device is queued to fold into
+                    self.dropped += 1
+                    return False
+                else:
+                    while len(self._events) >= self.maxsize and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        return False
+
+            self._events.append(event)
+            if len(self._events) > self.max_depth:
+                self.max_depth = len(self._events)
+            if self.depth_mirror is not None:
+                self.depth_mirror.value = len(self._events)
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Remove and return the oldest event, or None on timeout/close"""
+        with self._lock:
+            if timeout is None:
+                while not self._events and not self._closed:
+                    self._not_empty.wait()
+            elif not self._events and not self._closed:
+                self._not_empty.wait(timeout)
+
+            if not self._events:
+                return None
+
+            event = self._events.popleft()
+            if self.depth_mirror is not None:
+                self.depth_mirror.value = len(self._events)
+            self._not_full.notify()
+            return event
+
+    def close(self):
+        """Wake up any waiting producer/consumer and reject new events"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def reopen(self):
+        """Accept events again after close(), discarding anything left over"""
+        with self._lock:
+            self._events.clear()
+            self._closed = False
+            if self.depth_mirror is not None:
+                self.depth_mirror.value = 0
+
+    def depth(self):
+        """Current number of pending events"""
+        return len(self._events)
+
+    def get_stats(self):
+        """Get queue statistics"""
+        return {
+            'queue_depth': len(self._events),
+            'queue_max_depth': self.max_depth,
+            'queue_dropped': self.dropped,
+            'queue_coalesced': self.coalesced,
+            'queue_policy': self.overflow_policy
+        }
+
+
+class StepInjector:
+    """Dedicated thread that drains a StepQueue into a movement engine"""
+
+    def __init__(self, step_queue, movement, debug_mode=False, latency=None, shaper=None):
+        self.step_queue = step_queue
+        self.movement = movement
+        self.shaper = shaper
+        self.debug_mode = debug_mode
+        self.latency = latency
+
+        self.is_running = False
+        self.injector_thread = None
+
+        # Statistics
+        self.steps_injected = 0
+        self.last_queue_delay = 0.0
+
+    def start(self):
+        """Start the injector thread"""
+        if self.is_running:
+            return
+
+        self.step_queue.reopen()
+        if self.shaper:
+            self.shaper.clear()
+        self.movement.start()
+        self.is_running = True
+        self.injector_thread = threading.Thread(target=self._inject_loop, daemon=True)
+        self.injector_thread.start()
+
+    def stop(self):
+        """Stop the injector thread, dropping any pending events"""
+        if not self.is_running:
+            return
+
+        self.is_running = False
+        self.step_queue.close()
+
+        if self.injector_thread and self.injector_thread.is_alive():
+            self.injector_thread.join(timeout=2.0)
+
+        self.movement.stop()
+
+    def _inject_loop(self):
+        """Main injection loop"""
+        shaper = self.shaper
+        while self.is_running:
+            # Wake up in time for the next paced step, if any are backlogged
+            event = self.step_queue.get(shaper.next_release() if shaper else None)
+            if shaper:
+                self._release()
+            if event is not None:
+                self._inject(event)
+
+    def run_pending(self, now):
+        """Inject queued and due backlogged steps from the calling thread at time `now`
+
+        Drives the pipeline on a recorded clock (replay.py --fast) instead of
+        the injector thread; `now` uses the same time base as the events'
+        received_at. Returns the time the next backlogged step is due, None
+        without backlog.
+        """
+        if self.shaper:
+            self._release(now)
+        while True:
+            event = self.step_queue.get(0)
+            if event is None:
+                break
+            self._inject(event, now)
+        if self.shaper and self.shaper.pending:
+            # Always move forward, a due time rounded down would stall the caller
+            return now + max(self.shaper.next_release(now), 1e-6)
+        return None
+
+    def _release(self, now=None):
+        """Inject backlogged steps whose turn has come"""
+        for key, count in self.shaper.release(now):
+            self.movement.on_step(time.time() if now is None else now, count, key)
+            self.steps_injected += count
+
+    def _inject(self, event, now=None):
+        """Pass one queued event through the shaper to the movement engine"""
+        self.last_queue_delay = (time.time() if now is None else now) - event.received_at
+
+        count = event.count
+        if self.shaper:
+            count = self.shaper.admit(event, now)
+            if not count:
+                return
+
+        inject_start = time.perf_counter()
+        self.movement.on_step(event.received_at, count, event.key)
+        inject_time = time.perf_counter() - inject_start
+        self.steps_injected += count
+
+        if self.latency:
+            self.latency.record('queue', self.last_queue_delay)
+            self.latency.record('injection', inject_time)
+            self.latency.record('total', event.network_delay + self.last_queue_delay + inject_time)
+
+        if self.debug_mode:
+            log.debug("Injected %d step(s), queued %.1f ms", count, self.last_queue_delay * 1000,
+                      extra={'event': 'inject'})
+
+    def get_stats(self):
+        """Get injector statistics"""
+        stats = self.step_queue.get_stats()
+        stats.update(self.movement.get_stats())
+        if self.shaper:
+            stats.update(self.shaper.get_stats())
+        stats['steps_injected'] = self.steps_injected
+        stats['last_queue_delay'] = self.last_queue_delay
+        return stats
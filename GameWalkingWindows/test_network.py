@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
 """
 Network connectivity test for GameWalking
+
+    python test_network.py [port]
+        Bind the port and print whatever arrives (run with GameWalking closed)
+
+    python test_network.py --probe HOST [--port 9000] [--rate 20] [--count 200]
+        Measure the link to a running GameWalking on HOST: round-trip time
+        percentiles, jitter, loss, reordering and clock offset. Run it on a
+        second machine on the same Wi-Fi as the phone, or with HOST
+        127.0.0.1 on the PC itself. The PC shows the results as well.
 """
 
+import argparse
+import json
 import socket
 import sys
 
@@ -61,7 +72,7 @@ def test_udp_listener(port=9000):
     except socket.error as e:
         print(f"❌ Socket error: {e}")
         if "Address already in use" in str(e):
-            print("💡 Port 9000 is already in use. Close GameWalking app and try again.")
+            print(f"💡 Port {port} is already in use. Close GameWalking app and try again.")
         elif "Permission denied" in str(e):
             print("💡 Permission denied. Try running as Administrator.")
     except KeyboardInterrupt:
@@ -92,7 +103,75 @@ def test_firewall():
     except Exception as e:
         print(f"⚠️  Could not check firewall: {e}")
 
+def local_addresses():
+    """IPv4 addresses this PC is likely reachable at, primary first"""
+    addresses = []
+    try:
+        # Connecting a UDP socket sends nothing but picks the outgoing interface
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        probe.connect(('10.255.255.255', 1))
+        addresses.append(probe.getsockname()[0])
+        probe.close()
+    except OSError:
+        pass
+    try:
+        for address in socket.gethostbyname_ex(socket.gethostname())[2]:
+            if address not in addresses and not address.startswith('127.'):
+                addresses.append(address)
+    except OSError:
+        pass
+    return addresses
+
+def probe_link(args):
+    """Send pings to a running GameWalking and report the link quality"""
+    from net_probe import run_probe
+    
+    if not args.json:
+        print(f"📡 Probing {args.probe}:{args.port} with {args.count} pings at {args.rate:g}/s...")
+    try:
+        result = run_probe(args.probe, args.port, args.rate, args.count, args.timeout)
+    except OSError as e:
+        print(f"❌ Socket error: {e}")
+        return 1
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0 if result['received'] else 1
+    
+    if not result['received']:
+        print(f"❌ No replies from {result['target']}")
+        print("💡 Is GameWalking listening on that port, with answer_pings enabled and the firewall open?")
+        return 1
+    
+    print(f"   Sent {result['sent']}, received {result['received']} "
+          f"(loss {result['loss'] * 100:.1f}%, reordered {result['reordered']}, "
+          f"duplicates {result['duplicates']})")
+    print(f"   RTT min/p50/p95/p99/max: {result['rtt_min_ms']:.1f} / {result['rtt_p50_ms']:.1f} / "
+          f"{result['rtt_p95_ms']:.1f} / {result['rtt_p99_ms']:.1f} / {result['rtt_max_ms']:.1f} ms")
+    print(f"   Jitter: {result['jitter_ms']:.1f} ms")
+    print(f"   Clock offset (PC - this machine): {result['clock_offset_ms']:+.1f} ms")
+    
+    if result['loss'] > 0.02 or result['rtt_p95_ms'] > 50:
+        print("⚠️  This link will add noticeable lag or lost steps - try 5 GHz Wi-Fi or move closer to the router")
+    else:
+        print("✅ Link looks good for walking")
+    return 0
+
 def main():
+    parser = argparse.ArgumentParser(description='GameWalking network test')
+    parser.add_argument('listen_port', nargs='?', type=int, default=9000,
+                        help='Port to bind and print packets on (default 9000)')
+    parser.add_argument('--probe', metavar='HOST', help='Measure the link to GameWalking running on HOST')
+    parser.add_argument('--port', type=int, default=9000, help='GameWalking port for --probe')
+    parser.add_argument('--rate', type=float, default=20.0, help='Pings per second for --probe')
+    parser.add_argument('--count', type=int, default=200, help='Pings to send for --probe')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Seconds to wait for the last replies')
+    parser.add_argument('--json', action='store_true', help='Print --probe results as JSON')
+    args = parser.parse_args()
+    
+    if args.probe:
+        return probe_link(args)
+    
     print("🎮 GameWalking Network Connectivity Test")
     print("=" * 50)
     
@@ -101,19 +180,16 @@ def main():
     print()
     
     # Test UDP listener
-    port = 9000
-    if len(sys.argv) > 1:
-        try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print("Invalid port number, using default 9000")
-    
-    print(f"🌐 Your PC should be reachable at these addresses:")
-    print(f"   📱 Enter in Android app: 192.168.86.35:9000")
-    print(f"   📱 Alternative address: 172.17.144.1:9000")
-    print()
+    port = args.listen_port
+    addresses = local_addresses()
+    if addresses:
+        print(f"🌐 Your PC should be reachable at these addresses:")
+        print(f"   📱 Enter in Android app: {addresses[0]}:{port}")
+        for address in addresses[1:]:
+            print(f"   📱 Alternative address: {address}:{port}")
+        print()
     
     test_udp_listener(port)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
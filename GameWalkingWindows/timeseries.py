@@ -0,0 +1,225 @@
+"""
+Per-session step history with rolling statistics
+
+Every session keeps its most recent step timestamps and counts in a
+StepSeries, two preallocated array ring buffers, so memory stays the same
+however long a session runs. Rolling statistics are updated as each step
+arrives, in constant time:
+
+    cadence     steps per second over the last cadence_window seconds
+    gaps        smoothed mean and deviation of the time between steps,
+                the longest gap and the number of pauses (gaps > 2 s)
+    bursts      runs of steps closer than 0.2 s or packets carrying
+                several steps (step counter catch-ups)
+
+When a history file is configured, steps not yet written are appended to it
+in batches by SeriesWriter as columnar blocks:
+
+    file    8 bytes magic b'GWSTEP1\\n', then blocks
+    block   uint16 device name length, uint32 rows N (little-endian),
+            device name (UTF-8), N float64 timestamps (seconds since the
+            epoch), N uint16 step counts, all little-endian
+
+so a block's columns load straight into arrays, e.g.
+numpy.frombuffer(data, '<f8', N, offset). read_series() yields them back.
+"""
+
+import struct
+import sys
+from array import array
+
+MAGIC = b'GWSTEP1\n'
+BLOCK = struct.Struct('<HI')
+
+PAUSE_GAP = 2.0
+BURST_GAP = 0.2
+GAP_ALPHA = 0.1
+
+
+def _little_endian(values):
+    """Bytes of an array in little-endian order"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class StepSeries:
+    """Fixed-capacity ring of (timestamp, step count) with incremental statistics"""
+    __slots__ = ('capacity', 'window', 'times', 'counts', 'head', 'size', 'pending', 'overwritten',
+                 'window_size', 'window_steps', 'total_steps', 'last_time', 'last_count',
+                 'gap_mean', 'gap_var', 'max_gap', 'pauses', 'bursts', 'burst_steps', 'max_burst')
+
+    def __init__(self, capacity=4096, window=10.0):
+        self.capacity = capacity
+        self.window = window
+        self.times = array('d', bytes(8 * capacity))
+        self.counts = array('H', bytes(2 * capacity))
+        self.head = 0  # Next slot to write
+        self.size = 0  # Valid entries
+        self.pending = 0  # Newest entries not yet written to disk
+        self.overwritten = 0  # Steps lost because the ring wrapped before a flush
+
+        # Entries (newest first) inside the cadence window and their steps
+        self.window_size = 0
+        self.window_steps = 0
+
+        self.total_steps = 0
+        self.last_time = None
+        self.last_count = 0
+        self.gap_mean = 0.0
+        self.gap_var = 0.0
+        self.max_gap = 0.0
+        self.pauses = 0
+        self.bursts = 0
+        self.burst_steps = 0
+        self.max_burst = 0
+
+    def append(self, timestamp, count=1):
+        """Record `count` steps at `timestamp` (seconds)"""
+        capacity = self.capacity
+        head = self.head
+        count = min(count, 0xFFFF)
+
+        if self.size == capacity:
+            # The slot about to be reused holds the oldest entry
+            if self.pending == capacity:
+                self.overwritten += self.counts[head]
+                self.pending -= 1
+            if self.window_size == capacity:
+                self.window_steps -= self.counts[head]
+                self.window_size -= 1
+        else:
+            self.size += 1
+
+        self.times[head] = timestamp
+        self.counts[head] = count
+        self.head = (head + 1) % capacity
+        self.pending += 1
+        self.total_steps += count
+
+        # Slide the cadence window; each entry leaves it at most once
+        self.window_size += 1
+        self.window_steps += count
+        start = timestamp - self.window
+        while self.window_size > 1:
+            oldest = (self.head - self.window_size) % capacity
+            if self.times[oldest] >= start:
+                break
+            self.window_steps -= self.counts[oldest]
+            self.window_size -= 1
+
+        gap = None
+        if self.last_time is not None:
+            gap = timestamp - self.last_time
+            delta = gap - self.gap_mean
+            self.gap_mean += GAP_ALPHA * delta
+            self.gap_var = (1.0 - GAP_ALPHA) * (self.gap_var + GAP_ALPHA * delta * delta)
+            if gap > self.max_gap:
+                self.max_gap = gap
+            if gap > PAUSE_GAP:
+                self.pauses += 1
+
+        fast = gap is not None and gap < BURST_GAP
+        if fast or count > 1:
+            if not self.burst_steps:
+                self.bursts += 1
+                self.burst_steps = self.last_count if fast else 0
+            self.burst_steps += count
+            if self.burst_steps > self.max_burst:
+                self.max_burst = self.burst_steps
+        else:
+            self.burst_steps = 0
+
+        self.last_time = timestamp
+        self.last_count = count
+
+    def cadence(self, now):
+        """Steps per second over the cadence window, 0 once walking stopped"""
+        if self.last_time is None or now - self.last_time > self.window or self.window_size < 2:
+            return 0.0
+        oldest = (self.head - self.window_size) % self.capacity
+        span = self.last_time - self.times[oldest]
+        if span <= 0:
+            return 0.0
+        # Steps after the oldest entry, over the time they took
+        return (self.window_steps - self.counts[oldest]) / span
+
+    def take_pending(self):
+        """Copies of the (timestamps, counts) not yet written, oldest first, marking them written"""
+        pending = self.pending
+        self.pending = 0
+        start = (self.head - pending) % self.capacity
+        end = start + pending
+        if end <= self.capacity:
+            return self.times[start:end], self.counts[start:end]
+        end -= self.capacity
+        return self.times[start:] + self.times[:end], self.counts[start:] + self.counts[:end]
+
+    def stats(self, now):
+        return {
+            'cadence': self.cadence(now),
+            'total_steps': self.total_steps,
+            'gap_mean': self.gap_mean,
+            'gap_std': self.gap_var ** 0.5,
+            'max_gap': self.max_gap,
+            'pauses': self.pauses,
+            'bursts': self.bursts,
+            'max_burst': self.max_burst,
+            'stored': self.size,
+            'overwritten': self.overwritten
+        }
+
+
+class SeriesWriter:
+    """Appends StepSeries batches to a columnar history file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.rows = 0
+
+    def write(self, device, times, counts):
+        """Append one block of a device's timestamps and counts"""
+        if not times:
+            return
+        name = device.encode('utf-8')
+        self.file.write(b''.join((BLOCK.pack(len(name), len(times)), name,
+                                  _little_endian(times), _little_endian(counts))))
+        self.rows += len(times)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_series(path):
+    """Yield (device, timestamps array('d'), counts array('H')) for every block in a history file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a GameWalking step history file")
+
+    offset = len(MAGIC)
+    while offset + BLOCK.size <= len(data):
+        name_length, rows = BLOCK.unpack_from(data, offset)
+        offset += BLOCK.size
+        device = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        if offset + rows * 10 > len(data):
+            break  # Truncated by a crash mid-write
+
+        times = array('d')
+        times.frombytes(data[offset:offset + rows * 8])
+        offset += rows * 8
+        counts = array('H')
+        counts.frombytes(data[offset:offset + rows * 2])
+        offset += rows * 2
+        if sys.byteorder == 'big':
+            times.byteswap()
+            counts.byteswap()
+        yield device, times, counts
@@ -1,152 +1,710 @@
+import logging
+import selectors
 import socket
 import threading
 import time
-from config import Config
+from config import get_config
+from step_queue import StepEvent, StepQueue, StepInjector
+from movement import create_movement
+from shaper import create_shaper
+from protocol import (parse_packet, parse_redundant_steps, accel_sample_rate, build_pong, Message,
+                      MSG_STEP, MSG_ACCEL, MSG_PING, ACCEL_OFFSET, ACCEL_SAMPLE_SIZE)
+from sessions import SessionTable, SEQ_NEW, SEQ_LATE, SEQ_DUPLICATE, SEQ_EARLY
+from latency import LatencyStats
+from kernel_stats import udp_socket_stats
+from net_probe import LinkStats
+import spans
+
+log = logging.getLogger('gamewalking.listener')
+
+SHED_POLICIES = ('none', 'drop_accel', 'drop_all')
+# Probing sources whose link statistics are kept
+MAX_PROBE_SOURCES = 8
 
 class UDPListener:
-    def __init__(self, key_sender, gui_callback=None):
-        self.config = Config()
+    def __init__(self, key_sender):
+        self.config = get_config()
         self.key_sender = key_sender
-        self.gui_callback = gui_callback
         
         self.port = self.config.getint('NETWORK', 'port', 9000)
         self.buffer_size = self.config.getint('NETWORK', 'buffer_size', 1024)
+        self.receive_engine = self.config.get('NETWORK', 'receive_engine', 'simple')
+        self.batch_size = self.config.getint('NETWORK', 'batch_size', 32)
+        # Kernel receive buffer (SO_RCVBUF) in bytes, 0 keeps the OS default
+        self.recv_buffer = self.config.getint('NETWORK', 'recv_buffer', 0)
+        self.recv_buffer_actual = 0
+        # Load shedding once this many steps wait for the injector (0 = never)
+        self.shed_threshold = self.config.getint('NETWORK', 'shed_threshold', 0)
+        self.shed_policy = self.config.get('NETWORK', 'shed_policy', 'none')
+        if self.shed_policy not in SHED_POLICIES:
+            log.warning("Unknown shed policy '%s', load shedding disabled", self.shed_policy)
+            self.shed_policy = 'none'
         self.debug_mode = self.config.getboolean('GENERAL', 'debug_mode', False)
+        # Steps that reach us later than this after the phone detected them
+        # are dropped instead of moving a character that has already stopped
+        self.stale_after = self.config.getfloat('NETWORK', 'stale_after', 0.5)
+        # Answer PING datagrams from link probes (test_network.py --probe)
+        self.answer_pings = self.config.getboolean('NETWORK', 'answer_pings', True)
+        
+        # Steps are handed to a dedicated injector thread so key presses
+        # never block packet reception
+        self.step_queue = StepQueue(
+            self.config.getint('QUEUE', 'max_size', 64),
+            self.config.get('QUEUE', 'overflow_policy', 'drop_oldest')
+        )
+        self.movement = create_movement(key_sender, self.config)
+        self.latency = LatencyStats()
+        # Paces bursts (e.g. step counter catch-ups) per device using step_duration
+        self.shaper = create_shaper(key_sender, self.config)
+        self.injector = StepInjector(self.step_queue, self.movement, self.debug_mode, self.latency,
+                                     self.shaper)
+        
+        self.config.subscribe(self._on_config_change, 'GENERAL')
+        
+        # Optional ActivityLog (set by the GUI) for per-step messages
+        self.activity_log = None
+        
+        # Optional CaptureWriter recording every received datagram
+        self.capture = None
+        
+        # Optional SeriesWriter the per-session step histories are flushed to
+        self.history = None
+        self.history_flush_interval = self.config.getfloat('HISTORY', 'flush_interval', 30.0)
+        self.history_pending = 0
+        self.last_history_flush = 0.0
         
         self.socket = None
         self.is_listening = False
         self.listener_thread = None
         
         # Statistics
+        self.packets_received = 0
         self.steps_received = 0
         self.last_step_time = 0
         self.connection_status = "Disconnected"
+        # Bumped whenever the status changes; the GUI polls it instead of
+        # being called from the listener thread
+        self.status_version = 0
+        self.parse_errors = 0
+        self.socket_errors = 0
+        self.packets_lost = 0
+        self.packets_out_of_order = 0
+        self.packets_duplicate = 0
+        self.packets_recovered = 0
+        self.steps_stale = 0
+        self.accel_samples = 0
+        # Datagrams the kernel dropped because the receive buffer was full
+        # (None where the OS does not report it) and datagrams we shed
+        self.kernel_drops = None
+        self.receive_backlog_bytes = 0
+        self.socket_drops_seen = 0
+        self.packets_shed = 0
+        self.pings_answered = 0
+        # LinkStats per probing (ip, device id), most recently seen last
+        self.link_stats = {}
+        
+        # Server-side step detection for ACCEL packets, None until first needed
+        # and False when NumPy is not installed
+        self.step_detector = None
+        
+        # Per-device state, idle devices are evicted by _run_maintenance()
+        self.sessions = SessionTable(self.config, self.config.getfloat('NETWORK', 'session_timeout', 30.0))
+        self.sessions.on_evict = self._flush_session_history
+        # Seconds of silence before a phone no longer counts as connected
+        self.liveness_timeout = self.config.getfloat('NETWORK', 'liveness_timeout', 10.0)
+        
+        # Maintenance runs on deadlines instead of a polling interval: a second
+        # after traffic (capture flush, kernel drops) and when the next session
+        # goes silent or idle, so an idle listener never wakes up
+        self.last_maintenance = 0.0
+        self.maintenance_packets = 0
+        self.next_maintenance = None
+        
+        # Socket pair that interrupts the listener thread's select() on stop
+        self.wakeup_recv = None
+        self.wakeup_send = None
         
     def start_listening(self):
         """Start UDP listener"""
         if self.is_listening:
-            print("Listener already running")
+            log.warning("Listener already running")
             return False
         
         try:
-            # Create UDP socket
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            
-            # Bind to all interfaces on specified port
-            self.socket.bind(('', self.port))
-            self.socket.settimeout(1.0)  # 1 second timeout for recv
+            self.socket = self._open_socket()
+            self.socket.setblocking(False)
+            self._open_wakeup()
             
             self.is_listening = True
             self.connection_status = "Listening"
             
+            # Start injector before the listener so no step is queued unread
+            self.injector.start()
+            
             # Start listener thread
             self.listener_thread = threading.Thread(target=self._listen_loop, daemon=True)
             self.listener_thread.start()
             
-            print(f"UDP Listener started on port {self.port}")
-            self._update_gui_status()
+            log.info("UDP Listener started on port %d", self.port)
+            self._publish_status()
             return True
             
         except socket.error as e:
-            print(f"Failed to start UDP listener: {e}")
+            log.error("Failed to start UDP listener: %s", e)
+            self._close_sockets()
             self.connection_status = f"Error: {e}"
-            self._update_gui_status()
+            self._publish_status()
             return False
     
+    def _open_socket(self):
+        """Create the UDP socket bound to all interfaces on the configured port"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._configure_socket(sock)
+            sock.bind(('', self.port))
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+    
+    def _configure_socket(self, sock):
+        """Apply the receive buffer size and reset the kernel drop baseline"""
+        if self.recv_buffer > 0:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+        # Linux reports double the requested size (bookkeeping overhead), others the size itself
+        self.recv_buffer_actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if 0 < self.recv_buffer_actual < self.recv_buffer:
+            log.warning("Receive buffer limited to %d bytes by the OS (requested %d)",
+                        self.recv_buffer_actual, self.recv_buffer)
+        self.socket_drops_seen = 0
+    
     def stop_listening(self):
         """Stop UDP listener"""
         if not self.is_listening:
-            print("Listener not running")
+            log.warning("Listener not running")
             return
         
         self.is_listening = False
         self.connection_status = "Stopping"
         
-        if self.socket:
-            self.socket.close()
-            self.socket = None
-        
-        if self.listener_thread and self.listener_thread.is_alive():
+        # The listener thread exits as soon as select() sees the wakeup byte;
+        # closing the queue first frees it if it waits in put() (block policy)
+        self.step_queue.close()
+        self.wakeup()
+        if self.listener_thread and self.listener_thread is not threading.current_thread():
             self.listener_thread.join(timeout=2.0)
+        self.listener_thread = None
+        self._close_sockets()
+        
+        self.injector.stop()
         
         self.connection_status = "Disconnected"
-        print("UDP Listener stopped")
-        self._update_gui_status()
+        log.info("UDP Listener stopped")
+        self._publish_status()
+    
+    def _open_wakeup(self):
+        """Create the socket pair used to interrupt the listener thread"""
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.wakeup_recv.setblocking(False)
+        self.wakeup_send.setblocking(False)
+    
+    def wakeup(self):
+        """Make the listener thread re-check its state now, from any thread"""
+        if self.wakeup_send is None:
+            return
+        try:
+            self.wakeup_send.send(b'\0')
+        except OSError:
+            pass  # A wakeup is already pending, or the pair is closed
+    
+    def _close_sockets(self):
+        for sock in (self.socket, self.wakeup_recv, self.wakeup_send):
+            if sock is not None:
+                sock.close()
+        self.socket = None
+        self.wakeup_recv = None
+        self.wakeup_send = None
     
     def _listen_loop(self):
-        """Main listening loop"""
-        while self.is_listening:
-            try:
-                # Receive data
-                data, addr = self.socket.recvfrom(self.buffer_size)
-                message = data.decode('utf-8').strip()
+        """Wait for datagrams, a wakeup or the next maintenance deadline, whichever comes first"""
+        sock = self.socket
+        if self.receive_engine == 'batched':
+            receive = self._receive_batch
+            self.batch_buffers = [memoryview(bytearray(self.buffer_size)) for _ in range(self.batch_size)]
+            self.batch_sizes = [0] * self.batch_size
+            self.batch_addrs = [None] * self.batch_size
+        else:
+            receive = self._receive_each
+        
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        selector.register(self.wakeup_recv, selectors.EVENT_READ)
+        
+        try:
+            while self.is_listening:
+                deadline = self._maintenance_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
                 
-                if self.debug_mode:
-                    print(f"Received from {addr}: {message}")
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is sock:
+                        receive(sock)
+                    else:
+                        self._drain_wakeup()
                 
-                # Process message
-                if message == "STEP":
-                    self._handle_step(addr)
-                else:
-                    if self.debug_mode:
-                        print(f"Unknown message: {message}")
+                if deadline is not None and self.is_listening:
+                    now = time.time()
+                    if now >= deadline:
+                        self._run_maintenance(now)
                 
-            except socket.timeout:
-                # Timeout is normal, just continue
-                continue
-            except socket.error as e:
-                if self.is_listening:  # Only log if we're supposed to be listening
-                    print(f"Socket error: {e}")
-                break
-            except Exception as e:
-                print(f"Unexpected error in listener: {e}")
+        except (socket.error, ValueError) as e:
+            if self.is_listening:  # Only log if we're supposed to be listening
+                self.socket_errors += 1
+                log.error("Socket error: %s", e)
+        except Exception as e:
+            log.exception("Unexpected error in listener: %s", e)
+        finally:
+            selector.close()
+        
+        log.info("Listener loop ended")
+    
+    def _drain_wakeup(self):
+        try:
+            while self.wakeup_recv.recv(64):
+                pass
+        except BlockingIOError:
+            pass
+    
+    def _receive_each(self, sock):
+        """Handle every pending datagram with one recvfrom() each"""
+        while self.is_listening:
+            try:
+                data, addr = sock.recvfrom(self.buffer_size)
+            except BlockingIOError:
+                return
+            self._process_packet(data, addr)
+    
+    def _receive_batch(self, sock):
+        """Drain up to batch_size pending datagrams into the preallocated buffers"""
+        buffers = self.batch_buffers
+        sizes = self.batch_sizes
+        addrs = self.batch_addrs
+        
+        tracer = spans.TRACER
+        if tracer is not None:
+            start = time.perf_counter()
+        
+        count = 0
+        while count < self.batch_size:
+            try:
+                sizes[count], addrs[count] = sock.recvfrom_into(buffers[count])
+            except BlockingIOError:
                 break
+            count += 1
+        
+        if tracer is not None:
+            tracer.record('receive', start)
+        self._process_batch(buffers, sizes, addrs, count)
+    
+    def _maintenance_deadline(self):
+        """When maintenance is next due, None if nothing is pending"""
+        deadline = self.next_maintenance
+        if self.packets_received != self.maintenance_packets:
+            # Flush the capture and read the kernel drop counter soon after traffic
+            due = self.last_maintenance + 1.0
+            if deadline is None or due < deadline:
+                deadline = due
+        if self.history is not None and self.history_pending:
+            due = self.last_history_flush + self.history_flush_interval
+            if deadline is None or due < deadline:
+                deadline = due
+        return deadline
+    
+    def _process_batch(self, buffers, sizes, addrs, count):
+        """Dispatch the first count datagrams of a received batch"""
+        for i in range(count):
+            self._process_packet(buffers[i], addrs[i], sizes[i])
+    
+    def _process_packet(self, data, addr, length=None, received_at=None):
+        """Decode a datagram and dispatch it
+
+        received_at replays a recorded receive time (replay.py --fast); it
+        stands in for both the wall and the monotonic clock, so the stale
+        check, sessions and cadence follow the capture, not the replay speed.
+        """
+        self.packets_received += 1
+        if self.capture is not None:
+            self.capture.write(data, addr, length)
+        
+        tracer = spans.TRACER
+        if tracer is not None:
+            start = time.perf_counter()
+        message = parse_packet(data, length)
+        if tracer is not None:
+            tracer.record('parse', start)
+        
+        if message is None:
+            self.parse_errors += 1
+            if self.debug_mode:
+                log.debug("Unknown message from %s: %r", addr, bytes(data[:min(length or len(data), 32)]),
+                          extra={'event': 'parse_error'})
+            return
+        
+        if self.debug_mode:
+            log.debug("Received v%d message type %d from %s", message.version, message.msg_type, addr,
+                      extra={'event': 'packet'})
+        
+        if received_at is None:
+            now = time.time()
+            arrival = time.monotonic()
+        else:
+            now = arrival = received_at
+        
+        if message.msg_type == MSG_PING:
+            # Probes are not phones: answer without creating a session
+            self._answer_ping(message, data, addr, arrival)
+            return
+        
+        session = self.sessions.lookup(addr, message.device_id, now)
+        session.packets += 1
+        if not session.live:
+            # First packet, or the phone is back after going silent
+            self.sessions.mark_live(session)
+            self._refresh_connection_status(session)
+            self._publish_status()
         
-        print("Listener loop ended")
+        if message.sequence is not None and not self._track_sequence(session, message):
+            pass  # Duplicate or too old to be useful
+        elif self._should_shed(message):
+            self.packets_shed += 1
+        elif message.msg_type == MSG_STEP:
+            if tracer is not None:
+                start = time.perf_counter()
+            network_delay = None
+            if message.sequence is not None:
+                network_delay = self._recover_steps(session, message, data, length, now, arrival)
+            self._handle_step(session, message, now, arrival, network_delay)
+            if tracer is not None:
+                tracer.record('handle_step', start)
+        elif message.msg_type == MSG_ACCEL:
+            if tracer is not None:
+                start = time.perf_counter()
+            self._handle_accel(session, message, data, length, now, arrival)
+            if tracer is not None:
+                tracer.record('handle_accel', start)
+        elif self.debug_mode:
+            log.debug("Unhandled message type: %d", message.msg_type, extra={'event': 'packet'})
+        
+        if now - self.last_maintenance >= 1.0:
+            self._run_maintenance(now)
+    
+    def _should_shed(self, message):
+        """Whether to discard a packet because the injector is too far behind"""
+        if self.shed_policy == 'none' or not self.shed_threshold:
+            return False
+        if self.step_queue.depth() < self.shed_threshold:
+            return False
+        return self.shed_policy == 'drop_all' or message.msg_type == MSG_ACCEL
     
-    def _handle_step(self, addr):
-        """Handle received step command"""
-        self.steps_received += 1
-        self.last_step_time = time.time()
-        self.connection_status = f"Connected to {addr[0]}"
+    def _track_sequence(self, session, message):
+        """Deduplicate and count lost/reordered packets from a v2 sender, False drops the packet"""
+        result = session.window.accept(message.sequence)
         
-        # Send key command
-        self.key_sender.send_step()
+        if result == SEQ_NEW:
+            self.packets_lost += session.window.skipped
+            return True
+        if result == SEQ_LATE:
+            # A packet we had given up on arrived after all
+            self.packets_lost -= 1
+            self.packets_out_of_order += 1
+            return True
+        if result == SEQ_EARLY:
+            self.packets_out_of_order += 1
+            return True
+        if result == SEQ_DUPLICATE:
+            self.packets_duplicate += 1
+        else:
+            self.packets_out_of_order += 1
+        return False
+    
+    def _recover_steps(self, session, message, data, length, now, arrival):
+        """Handle repeated earlier steps whose own packets were lost
+
+        Runs before the packet's own step, oldest copy first, so cadence and
+        history see the steps in order. Returns this packet's network delay
+        (None without copies), which is taken from its own, newest timestamp.
+        Copies from before the device's first packet (sent before we started
+        listening or before its session was evicted) are only marked as seen.
+        A copy is as late as its age relative to this packet plus this
+        packet's network delay, and is dropped beyond stale_after.
+        """
+        steps = parse_redundant_steps(data, length, message)
+        if not steps:
+            return None
+
+        network_delay = session.clock.update(message.sender_time / 1e6, arrival)
+        for step in steps:
+            result = session.window.accept(step.sequence)
+            if result != SEQ_LATE:
+                continue
+            self.packets_lost -= 1
+            age = (message.sender_time - step.sender_time) / 1e6
+            if self.stale_after > 0 and age + network_delay > self.stale_after:
+                self.steps_stale += step.step_count
+                continue
+            self.packets_recovered += 1
+            self._handle_step(session, step, now, arrival, age + network_delay, age)
+        return network_delay
+    
+    def _handle_step(self, session, message, now, arrival, network_delay=None, age=0.0):
+        """Handle received step command, `arrival` is the receive time on the monotonic clock
+
+        network_delay is passed when already known (recovered copies and
+        their packet), and `age` places a recovered copy's step that many
+        seconds before `now` in the session's cadence and history.
+        """
+        # Transit time from the phone's step event, relative to the best observed path
+        if message.sender_time is None:
+            network_delay = 0.0
+        else:
+            if network_delay is None:
+                network_delay = session.clock.update(message.sender_time / 1e6, arrival)
+            if self.stale_after > 0 and network_delay > self.stale_after:
+                self.steps_stale += message.step_count
+                if self.debug_mode:
+                    log.debug("Dropped stale step from %s (%.0f ms late)", session.name(), network_delay * 1000,
+                              extra={'event': 'stale'})
+                return
+            self.latency.record('network', network_delay)
         
-        # Update GUI
-        self._update_gui_status()
+        self.steps_received += message.step_count
+        self.last_step_time = now
+        session.steps += message.step_count
+        session.cadence.update(now - age)
+        session.history.append(now - age, message.step_count)
+        self.history_pending += 1
+        self._refresh_connection_status(session)
+        
+        # Queue key command for the injector thread
+        self.step_queue.put(StepEvent(session.addr, now, message.step_count,
+                                      message.device_id, message.sender_time, session.forward_key,
+                                      network_delay))
+        
+        # Let the GUI know there is something new to show
+        self._publish_status()
+        
+        if self.activity_log:
+            self.activity_log.debug('listener', f"Step #{self.steps_received} from {session.name()}")
         
         if self.debug_mode:
-            print(f"Step #{self.steps_received} processed")
-    
-    def _update_gui_status(self):
-        """Update GUI with current status"""
-        if self.gui_callback:
-            status_info = {
-                'connection_status': self.connection_status,
-                'steps_received': self.steps_received,
-                'last_step_time': self.last_step_time,
-                'is_listening': self.is_listening
-            }
-            self.gui_callback(status_info)
+            log.debug("Step #%d processed (%s)", self.steps_received, session.name(), extra={'event': 'step'})
+    
+    def _handle_accel(self, session, message, data, length, now, arrival):
+        """Run server-side step detection on a batch of raw accelerometer samples"""
+        if length is None:
+            length = len(data)
+        if message.step_count == 0 or length < ACCEL_OFFSET + message.step_count * ACCEL_SAMPLE_SIZE:
+            self.parse_errors += 1
+            return
+        
+        if self.step_detector is None:
+            try:
+                import step_detector
+                self.step_detector = step_detector
+            except ImportError:
+                log.warning("NumPy is not installed - accelerometer packets will be ignored")
+                self.step_detector = False
+        if not self.step_detector:
+            return
+        
+        if session.detector is None:
+            session.detector = self.step_detector.AccelStepDetector()
+        
+        samples = self.step_detector.decode_accel_samples(data, message.step_count)
+        self.accel_samples += message.step_count
+        
+        offsets = session.detector.process(samples, accel_sample_rate(data))
+        if not offsets:
+            return
+        
+        # Report the detected steps as one STEP stamped with the last step's sample time
+        sender_time = None
+        if message.sender_time is not None:
+            sender_time = message.sender_time + int(offsets[-1] * 1e6)
+        self._handle_step(session, Message(message.version, MSG_STEP, message.device_id,
+                                           message.sequence, sender_time, len(offsets)), now, arrival)
+    
+    def _answer_ping(self, message, data, addr, arrival):
+        """Reply to a link probe and track the link quality it shows"""
+        if not self.answer_pings:
+            return
+        if self._send_reply(build_pong(data, time.time()), addr):
+            self.pings_answered += 1
+        
+        key = (addr[0], message.device_id)
+        stats = self.link_stats.pop(key, None)
+        if stats is None:
+            if len(self.link_stats) >= MAX_PROBE_SOURCES:
+                del self.link_stats[next(iter(self.link_stats))]
+            stats = LinkStats(f"{addr[0]}#{message.device_id}")
+        self.link_stats[key] = stats
+        stats.update(message.sequence, message.sender_time, message.step_count, arrival)
+        self._publish_status()
+    
+    def _send_reply(self, payload, addr):
+        """Send a datagram from the listening socket without blocking, False if it was not sent"""
+        sock = self.socket
+        if sock is None:
+            return False
+        try:
+            sock.sendto(payload, addr)
+        except OSError:
+            return False
+        return True
+    
+    def _link_probe_summary(self):
+        """Link statistics of the most recent probe, None if there was none"""
+        if not self.link_stats:
+            return None
+        stats = next(reversed(self.link_stats.values()))
+        return stats.summary(time.monotonic())
+    
+    def _refresh_connection_status(self, session=None):
+        """Describe the live devices in connection_status"""
+        if not self.is_listening:
+            return
+        live = self.sessions.live_count
+        if live == 0:
+            self.connection_status = "Listening"
+        elif live == 1:
+            if session is None or not session.live:
+                session = next(s for s in self.sessions.sessions.values() if s.live)
+            self.connection_status = f"Connected to {session.addr[0]}"
+        else:
+            self.connection_status = f"Connected to {live} devices"
+    
+    def _run_maintenance(self, now):
+        """Housekeeping: flush the capture, poll kernel drops, expire silent and idle sessions"""
+        self.last_maintenance = now
+        self.maintenance_packets = self.packets_received
+        if self.capture is not None:
+            self.capture.flush()
+        self._poll_kernel_stats()
+        if self.history is not None and now - self.last_history_flush >= self.history_flush_interval:
+            self._flush_history(now)
+        changed = self.sessions.expire_silent(now, self.liveness_timeout)
+        changed += self.sessions.evict_idle(now)
+        if changed:
+            self._refresh_connection_status()
+            self._publish_status()
+        self.next_maintenance = self.sessions.next_deadline(self.liveness_timeout)
+    
+    def _poll_kernel_stats(self):
+        """Accumulate the socket's kernel drop counter"""
+        sock = self.socket
+        if sock is None:
+            return
+        stats = udp_socket_stats(sock)
+        if stats is None:
+            return
+        drops, self.receive_backlog_bytes = stats
+        if drops > self.socket_drops_seen:
+            self.kernel_drops = (self.kernel_drops or 0) + drops - self.socket_drops_seen
+            self.socket_drops_seen = drops
+            self._publish_status()
+        elif self.kernel_drops is None:
+            self.kernel_drops = 0
+    
+    def start_capture(self, path):
+        """Append every received datagram to a capture file (see capture.py)"""
+        from capture import CaptureWriter
+        self.capture = CaptureWriter(path)
+        log.info("Capturing packets to %s", path)
+    
+    def stop_capture(self):
+        """Close the capture file; call after stop_listening()"""
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            capture.close()
+            log.info("Captured %d packets to %s", capture.packets, capture.path)
+    
+    def start_history(self, path):
+        """Append the per-session step histories to a file in batches (see timeseries.py)"""
+        from timeseries import SeriesWriter
+        self.history = SeriesWriter(path)
+        self.last_history_flush = time.time()
+        log.info("Recording step history to %s", path)
+    
+    def stop_history(self):
+        """Write out the remaining steps and close the history file; call after stop_listening()"""
+        if self.history is None:
+            return
+        self._flush_history(time.time())
+        history, self.history = self.history, None
+        history.close()
+        log.info("Recorded %d steps to %s", history.rows, history.path)
+    
+    def _flush_history(self, now):
+        """Write every session's unwritten steps as one batch"""
+        self.last_history_flush = now
+        self.history_pending = 0
+        for session in list(self.sessions.sessions.values()):
+            self._flush_session_history(session)
+        self.history.flush()
+    
+    def _flush_session_history(self, session):
+        if self.history is not None and session.history.pending:
+            self.history.write(session.name(), *session.history.take_pending())
+    
+    def _on_config_change(self, section, key, value):
+        """Follow debug mode changes made anywhere in the app"""
+        if key == 'debug_mode':
+            self.debug_mode = self.config.getboolean('GENERAL', 'debug_mode', False)
+            self.injector.debug_mode = self.debug_mode
+    
+    def _publish_status(self):
+        """Mark the status as changed for anyone polling status_version"""
+        self.status_version += 1
     
     def get_status(self):
         """Get current listener status"""
         return {
             'is_listening': self.is_listening,
             'connection_status': self.connection_status,
+            'packets_received': self.packets_received,
             'steps_received': self.steps_received,
             'last_step_time': self.last_step_time,
-            'port': self.port
+            'port': self.port,
+            'parse_errors': self.parse_errors,
+            'socket_errors': self.socket_errors,
+            'packets_lost': self.packets_lost,
+            'packets_out_of_order': self.packets_out_of_order,
+            'packets_duplicate': self.packets_duplicate,
+            'packets_recovered': self.packets_recovered,
+            'steps_stale': self.steps_stale,
+            'accel_samples': self.accel_samples,
+            'kernel_drops': self.kernel_drops,
+            'packets_shed': self.packets_shed,
+            'receive_backlog_bytes': self.receive_backlog_bytes,
+            'recv_buffer': self.recv_buffer_actual,
+            'pings_answered': self.pings_answered,
+            'link_probe': self._link_probe_summary(),
+            'latency': self.latency.summary(),
+            **self.sessions.get_stats(),
+            **self.injector.get_stats()
         }
     
     def update_port(self, new_port):
-        """Update listening port"""
-        if self.is_listening:
-            print("Cannot change port while listening")
-            return False
+        """Update listening port, rebinding right away if the listener is running"""
+        if new_port == self.port:
+            return True
+        
+        restart = self.is_listening
+        if restart:
+            self.stop_listening()
         
         self.port = new_port
         self.config.set('NETWORK', 'port', str(new_port))
+        if restart:
+            return self.start_listening()
         return True
\ No newline at end of file